@@ -3,6 +3,7 @@ from typing import Dict, List
 
 from apps.chatbot.graph.state import AgentState, ChatMessage
 from core.clients.gemini_client import get_chat_model
+from core.clients.resilience import call_with_retry, openai_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -62,7 +63,7 @@ def conversation_agent_node(state: AgentState) -> Dict:
             query=query,
             history_section=history_section
         )
-        response = llm.invoke(prompt)
+        response = call_with_retry(openai_breaker, llm.invoke, prompt)
         answer = response.content
     except Exception as e:
         logger.error(f"Conversation generation failed: {str(e)}")
@@ -5,6 +5,7 @@ from apps.chatbot.graph.state import AgentState, ChatMessage
 from apps.chatbot.retrievers.supabase_retriever import SupabaseRetriever
 from apps.chatbot.tools.response_validator import humanize_response
 from core.clients.gemini_client import get_chat_model
+from core.clients.resilience import call_with_retry, openai_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -130,7 +131,7 @@ def rag_agent_node(state: AgentState) -> Dict:
             query=query,
             history_section=history_section
         )
-        response = llm.invoke(prompt)
+        response = call_with_retry(openai_breaker, llm.invoke, prompt)
         answer = response.content
 
         # Humanize response if it sounds robotic
@@ -13,6 +13,7 @@ from apps.chatbot.agents import (
     document_agent_node,
     web_search_agent_node
 )
+from core.clients.gemini_client import request_embedding_scope
 
 logger = logging.getLogger(__name__)
 
@@ -103,8 +104,9 @@ class WorkflowManager:
 
         logger.info(f"Processing query for user {user_id}, thread {thread_id}")
 
-        # Run workflow
-        result = self.app.invoke(initial_state)
+        # Run workflow; agents share query embeddings within this request
+        with request_embedding_scope():
+            result = self.app.invoke(initial_state)
 
         # Extract response
         responses = result.get("responses", [])
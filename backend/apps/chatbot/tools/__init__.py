@@ -1,5 +1,5 @@
 from .intent_classifier import IntentClassifier, classify_intent, AgentType
-from .vector_embedding import embed_and_store_chunks, embed_single_document
+from .vector_embedding import embed_and_store_chunks, embed_single_document, store_embedded_chunks
 from .file_upload import process_and_vectorize_file, process_file_only
 from .web_search import web_search, search_and_summarize
 from .db_query import execute_read_query, get_table_info
@@ -7,7 +7,7 @@ from .response_validator import validate_response, quick_validate
 
 __all__ = [
     'IntentClassifier', 'classify_intent', 'AgentType',
-    'embed_and_store_chunks', 'embed_single_document',
+    'embed_and_store_chunks', 'embed_single_document', 'store_embedded_chunks',
     'process_and_vectorize_file', 'process_file_only',
     'web_search', 'search_and_summarize',
     'execute_read_query', 'get_table_info',
@@ -1,8 +1,11 @@
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from apps.chatbot.agents.document_agent import process_document
 from apps.chatbot.tools.vector_embedding import embed_and_store_chunks
+from apps.documents.models import EmbeddingBatch
+from core.clients.gemini_client import BATCH_EMBED_MIN_TEXTS, submit_embedding_batch
+from settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +56,20 @@ def process_and_vectorize_file(
     metadata = process_result.get("metadata", {})
 
     # Step 2: Vectorize (embed and store)
+    if settings.EMBEDDING_BATCH_ENABLED and len(chunks) >= BATCH_EMBED_MIN_TEXTS:
+        batch_id = _submit_embedding_batch(document_key, chunks, user_id, thread_id, persist_embeddings)
+        if batch_id:
+            return {
+                "success": True,
+                "document_key": document_key,
+                "chunk_count": len(chunks),
+                "stored_count": 0,
+                "vectorized": False,
+                "embedding_batch_id": batch_id,
+                "persistent": persist_embeddings,
+                "metadata": metadata
+            }
+
     logger.info(f"Vectorizing {len(chunks)} chunks...")
 
     embed_result = embed_and_store_chunks(
@@ -84,6 +101,36 @@ def process_and_vectorize_file(
     }
 
 
+def _submit_embedding_batch(
+    document_key: str,
+    chunks: List[Dict],
+    user_id: str,
+    thread_id: Optional[str],
+    is_persistent: bool
+) -> Optional[str]:
+    """
+    Submit chunks to the Batch API and record the pending batch.
+
+    Returns:
+        Batch id, or None if submission failed (caller embeds interactively)
+    """
+    try:
+        texts = [chunk.get("content", "") for chunk in chunks]
+        batch_id = submit_embedding_batch(texts, display_name=document_key)
+        EmbeddingBatch.objects.create(
+            batch_id=batch_id,
+            document_key=document_key,
+            user_id=user_id,
+            thread_id=thread_id,
+            is_persistent=is_persistent,
+            chunks=chunks
+        )
+        return batch_id
+    except Exception as e:
+        logger.warning(f"Batch embedding submission failed, using interactive API: {str(e)}")
+        return None
+
+
 def process_file_only(
     file_path: str,
     user_id: str,
@@ -4,6 +4,7 @@ from typing import Dict, Optional, Literal
 from pydantic import BaseModel, Field
 
 from core.clients.gemini_client import get_chat_model
+from core.clients.resilience import call_with_retry, openai_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -112,7 +113,7 @@ class IntentClassifier:
         try:
             history_context = self._format_history_context(chat_history or [])
             prompt = CLASSIFICATION_PROMPT.format(query=query, history_context=history_context)
-            result = self.structured_llm.invoke(prompt)
+            result = call_with_retry(openai_breaker, self.structured_llm.invoke, prompt)
 
             return {
                 "agent": result.agent,
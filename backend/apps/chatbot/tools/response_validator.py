@@ -4,6 +4,7 @@ from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 from core.clients.gemini_client import get_chat_model
+from core.clients.resilience import call_with_retry, openai_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -87,7 +88,7 @@ def validate_response(
             response=response[:2000]  # Limit response size
         )
 
-        result = structured_llm.invoke(prompt)
+        result = call_with_retry(openai_breaker, structured_llm.invoke, prompt)
 
         is_valid = result.confidence_score >= threshold and result.is_grounded
 
@@ -199,7 +200,7 @@ def humanize_response(response: str) -> str:
     try:
         llm = get_chat_model(temperature=0.3)
         prompt = HUMANIZE_PROMPT.format(response=response)
-        result = llm.invoke(prompt)
+        result = call_with_retry(openai_breaker, llm.invoke, prompt)
 
         humanized = result.content.strip()
         logger.info("Response humanized successfully")
@@ -2,10 +2,13 @@ import logging
 from typing import Dict, List, Optional
 
 from core.clients.gemini_client import embed_documents
-from core.clients.supabase_client import upsert_document
+from core.clients.supabase_client import upsert_documents
 
 logger = logging.getLogger(__name__)
 
+# Rows per upsert request
+UPSERT_BATCH_SIZE = 200
+
 
 def embed_and_store_chunks(
     chunks: List[Dict],
@@ -40,46 +43,7 @@ def embed_and_store_chunks(
         logger.info(f"Generating embeddings for {len(texts)} chunks...")
         embeddings = embed_documents(texts)
 
-        if len(embeddings) != len(chunks):
-            return {
-                "success": False,
-                "error": "Embedding count mismatch",
-                "stored_count": 0
-            }
-
-        # Store each chunk with its embedding
-        stored_count = 0
-        errors = []
-
-        for chunk, embedding in zip(chunks, embeddings):
-            try:
-                result = upsert_document(
-                    key=chunk.get("key"),
-                    content=chunk.get("content", ""),
-                    embedding=embedding,
-                    user_id=user_id,
-                    thread_id=thread_id,
-                    is_persistent=is_persistent,
-                    parent_key=chunk.get("parent_key"),
-                    metadata=chunk.get("metadata", {})
-                )
-
-                if result:
-                    stored_count += 1
-                else:
-                    errors.append(f"Failed to store chunk: {chunk.get('key')}")
-
-            except Exception as e:
-                errors.append(f"Error storing {chunk.get('key')}: {str(e)}")
-
-        logger.info(f"Stored {stored_count}/{len(chunks)} chunks")
-
-        return {
-            "success": stored_count > 0,
-            "stored_count": stored_count,
-            "total_chunks": len(chunks),
-            "errors": errors if errors else None
-        }
+        return store_embedded_chunks(chunks, embeddings, user_id, thread_id, is_persistent)
 
     except Exception as e:
         logger.error(f"Error in embed_and_store_chunks: {str(e)}")
@@ -90,6 +54,72 @@ def embed_and_store_chunks(
         }
 
 
+def store_embedded_chunks(
+    chunks: List[Dict],
+    embeddings: List[List[float]],
+    user_id: str,
+    thread_id: Optional[str] = None,
+    is_persistent: bool = True
+) -> Dict:
+    """
+    Store chunks with precomputed embeddings in Supabase.
+
+    Args:
+        chunks: List of chunk dicts with 'content', 'key', 'parent_key', 'metadata'
+        embeddings: One embedding per chunk, in the same order
+        user_id: Owner of the documents
+        thread_id: Thread ID for session-scoped documents
+        is_persistent: If True, documents persist; if False, session-only
+
+    Returns:
+        Dict with success status and stored document count
+    """
+    if len(embeddings) != len(chunks):
+        return {
+            "success": False,
+            "error": "Embedding count mismatch",
+            "stored_count": 0
+        }
+
+    rows = [
+        {
+            'user_id': user_id,
+            'content': chunk.get("content", ""),
+            'embedding': embedding,
+            'key': chunk.get("key"),
+            'thread_id': thread_id,
+            'document_id': None,
+            'parent_key': chunk.get("parent_key"),
+            'is_persistent': is_persistent,
+            'metadata': chunk.get("metadata", {})
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+
+    # Store chunks in batches, one request per batch
+    stored_count = 0
+    errors = []
+
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        batch_stored = upsert_documents(batch)
+        stored_count += batch_stored
+
+        if not batch_stored:
+            errors.append(
+                f"Failed to store chunks {batch[0]['key']} .. {batch[-1]['key']}"
+            )
+
+    logger.info(f"Stored {stored_count}/{len(chunks)} chunks")
+
+    return {
+        "success": stored_count > 0,
+        "stored_count": stored_count,
+        "total_chunks": len(chunks),
+        "errors": errors if errors else None
+    }
+
+
 def embed_single_document(
     content: str,
     key: str,
@@ -12,11 +12,14 @@ from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from apps.documents.models import Document
-from core.clients.supabase_client import delete_documents_by_key, delete_file_from_storage
+from apps.documents.models import Document, EmbeddingBatch
+from core.clients.supabase_client import delete_documents_by_key, delete_files_from_storage
 
 logger = logging.getLogger(__name__)
 
+# Storage paths removed per request
+STORAGE_DELETE_BATCH_SIZE = 100
+
 
 class Command(BaseCommand):
     help = 'Clean up session-only documents older than specified hours (default: 24)'
@@ -67,29 +70,35 @@ class Command(BaseCommand):
         # Delete each document
         deleted_count = 0
         errors = []
+        storage_paths = []
 
         for doc in session_docs:
             try:
+                # Drop any pending embedding batch before deleting the vectors
+                EmbeddingBatch.objects.filter(document_key=doc.document_key).delete()
+
                 # Delete vectors from Supabase
                 vector_result = delete_documents_by_key(doc.document_key, str(doc.user_id))
                 if not vector_result.get('success'):
                     logger.warning(f'Failed to delete vectors for {doc.document_key}')
 
-                # Delete file from storage if exists
-                if doc.storage_path:
-                    try:
-                        delete_file_from_storage(doc.storage_path)
-                    except Exception as e:
-                        logger.warning(f'Failed to delete storage file: {e}')
-
                 # Delete Django record
                 doc.delete()
                 deleted_count += 1
 
+                # Files are removed from storage in bulk below
+                if doc.storage_path:
+                    storage_paths.append(doc.storage_path)
+
             except Exception as e:
                 errors.append(f'{doc.original_filename}: {str(e)}')
                 logger.error(f'Error deleting document {doc.document_key}: {e}')
 
+        for start in range(0, len(storage_paths), STORAGE_DELETE_BATCH_SIZE):
+            batch = storage_paths[start:start + STORAGE_DELETE_BATCH_SIZE]
+            if not delete_files_from_storage(batch):
+                logger.warning(f'Failed to delete {len(batch)} storage files')
+
         self.stdout.write(
             self.style.SUCCESS(f'Successfully deleted {deleted_count}/{count} session documents.')
         )
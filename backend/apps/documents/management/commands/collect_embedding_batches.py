@@ -0,0 +1,121 @@
+"""
+Management command to store the results of finished embedding batches.
+
+Large uploads are embedded through the OpenAI Batch API when
+EMBEDDING_BATCH_ENABLED is set; the upload only submits the batch. Run this
+periodically (e.g. every 10 minutes) to store the finished embeddings.
+
+Usage:
+    python manage.py collect_embedding_batches
+"""
+import logging
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand
+
+from apps.chatbot.tools import embed_and_store_chunks, store_embedded_chunks
+from apps.documents.models import Document, EmbeddingBatch
+from core.clients.gemini_client import get_embedding_batch_results
+from core.clients.supabase_client import delete_documents_by_key
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Store the embeddings of finished OpenAI embedding batches'
+
+    def handle(self, *args, **options):
+        pending = list(EmbeddingBatch.objects.all())
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('No pending embedding batches.'))
+            return
+
+        self.stdout.write(f'Checking {len(pending)} pending embedding batches.')
+
+        collected = 0
+        discarded = 0
+        errors = []
+
+        for batch in pending:
+            if not Document.objects.filter(document_key=batch.document_key).exists():
+                # Deleted or expired before its embeddings were ready
+                logger.info(f'Discarding embedding batch {batch.batch_id} of deleted document {batch.document_key}')
+                batch.delete()
+                discarded += 1
+                continue
+
+            try:
+                embeddings = get_embedding_batch_results(batch.batch_id)
+            except RuntimeError as e:
+                # Failed, expired or incomplete batch: embed with the interactive API instead
+                logger.warning(f'{str(e)}; embedding {batch.document_key} interactively')
+                result = self._embed_interactively(batch)
+            except Exception as e:
+                # Couldn't reach the Batch API; check again on the next run
+                errors.append(f'{batch.batch_id}: {str(e)}')
+                logger.error(f'Error checking embedding batch {batch.batch_id}: {e}')
+                continue
+            else:
+                if embeddings is None:
+                    continue  # Still running
+                result = self._store(batch, embeddings)
+
+            if not result.get('success'):
+                # Both paths failed; give up so the batch isn't retried forever
+                error = result.get("error") or result.get("errors")
+                errors.append(f'{batch.document_key}: {error}')
+                logger.error(f'Could not store embeddings for {batch.document_key}, dropping batch {batch.batch_id}: {error}')
+                batch.delete()
+                continue
+
+            batch.delete()
+            if not Document.objects.filter(document_key=batch.document_key).update(is_vectorized=True):
+                # The document was deleted while its embeddings were being stored
+                delete_documents_by_key(batch.document_key, batch.user_id)
+                discarded += 1
+                continue
+            collected += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored embeddings for {collected}/{len(pending)} batches.')
+        )
+        if discarded:
+            self.stdout.write(f'Discarded {discarded} batches of deleted documents.')
+
+        if errors:
+            self.stdout.write(self.style.ERROR(f'Errors ({len(errors)}):'))
+            for error in errors[:10]:
+                self.stdout.write(f'  - {error}')
+
+    def _store(self, batch: EmbeddingBatch, embeddings: List[List[float]]) -> Dict:
+        """Store the batch's embeddings, re-embedding interactively if that fails."""
+        try:
+            result = store_embedded_chunks(
+                batch.chunks,
+                embeddings,
+                user_id=batch.user_id,
+                thread_id=batch.thread_id,
+                is_persistent=batch.is_persistent
+            )
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+
+        if result.get('success') and not result.get('errors'):
+            return result
+
+        # Chunks are upserted by key, so a partial store is safe to redo
+        logger.warning(
+            f'Storing batch {batch.batch_id} failed ({result.get("error") or result.get("errors")}); '
+            f'embedding {batch.document_key} interactively'
+        )
+        return self._embed_interactively(batch)
+
+    @staticmethod
+    def _embed_interactively(batch: EmbeddingBatch) -> Dict:
+        return embed_and_store_chunks(
+            chunks=batch.chunks,
+            user_id=batch.user_id,
+            thread_id=batch.thread_id,
+            is_persistent=batch.is_persistent
+        )
@@ -0,0 +1,32 @@
+# Generated manually
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_document_file_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('batch_id', models.CharField(max_length=100, unique=True)),
+                ('document_key', models.CharField(db_index=True, max_length=100)),
+                ('user_id', models.CharField(max_length=100)),
+                ('thread_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_persistent', models.BooleanField(default=True)),
+                ('chunks', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'documents_embedding_batch',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -52,3 +52,28 @@ class Document(models.Model):
                 return f"{size:.1f} {unit}"
             size /= 1024
         return f"{size:.1f} TB"
+
+
+class EmbeddingBatch(models.Model):
+    """
+    A document whose chunks are being embedded through the OpenAI Batch API.
+
+    The upload request only submits the batch; the collect_embedding_batches
+    command stores the embeddings once the batch finishes.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    batch_id = models.CharField(max_length=100, unique=True)
+    document_key = models.CharField(max_length=100, db_index=True)
+    user_id = models.CharField(max_length=100)
+    thread_id = models.CharField(max_length=100, blank=True, null=True)
+    is_persistent = models.BooleanField(default=True)
+    chunks = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'documents_embedding_batch'
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.document_key} ({self.batch_id})"
@@ -1,22 +1,35 @@
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict
 
 try:
     import pytesseract
-    from PIL import Image
+    from PIL import Image, ImageOps
     TESSERACT_AVAILABLE = True
 except ImportError:
     TESSERACT_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# LSTM engine only, single uniform block of text
+TESSERACT_CONFIG = "--oem 1 --psm 6"
+
+
+@lru_cache(maxsize=1)
+def get_tesseract_version() -> str:
+    """Probe the Tesseract binary once per process; raises TesseractNotFoundError."""
+    return str(pytesseract.get_tesseract_version())
+
 
 class OCRParser:
     """Parser for images using Tesseract OCR."""
 
     SUPPORTED_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif']
 
+    # ~300 DPI for a letter-width page; larger images only slow Tesseract down
+    TARGET_WIDTH = 2500
+
     def __init__(self, tesseract_cmd: str = None):
         """
         Initialize OCR parser.
@@ -24,8 +37,22 @@ class OCRParser:
         Args:
             tesseract_cmd: Path to tesseract executable (optional)
         """
-        if tesseract_cmd and TESSERACT_AVAILABLE:
+        if (
+            tesseract_cmd and TESSERACT_AVAILABLE
+            and pytesseract.pytesseract.tesseract_cmd != tesseract_cmd
+        ):
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+            get_tesseract_version.cache_clear()
+
+    def _prepare_image(self, image: "Image.Image") -> "Image.Image":
+        """Downscale to TARGET_WIDTH and convert to contrast-stretched grayscale."""
+        scale = min(1.0, self.TARGET_WIDTH / image.width)
+        if scale < 1.0:
+            image = image.resize(
+                (int(image.width * scale), int(image.height * scale)),
+                Image.LANCZOS
+            )
+        return ImageOps.autocontrast(image.convert("L"))
 
     def parse(self, file_path: str, lang: str = 'eng') -> Dict:
         """
@@ -66,16 +93,24 @@ class OCRParser:
 
         try:
             image = Image.open(file_path)
+            image_format = image.format
+            image_mode = image.mode
+            original_size = image.size
+
+            image = self._prepare_image(image)
+
+            get_tesseract_version()
 
             # Extract text using Tesseract
-            content = pytesseract.image_to_string(image, lang=lang)
+            content = pytesseract.image_to_string(image, lang=lang, config=TESSERACT_CONFIG)
 
             metadata = {
                 "filename": path.name,
                 "file_type": "image",
-                "image_format": image.format,
-                "image_size": image.size,
-                "image_mode": image.mode,
+                "image_format": image_format,
+                "image_size": original_size,
+                "ocr_image_size": image.size,
+                "image_mode": image_mode,
                 "file_size": path.stat().st_size,
                 "ocr_language": lang
             }
@@ -1,3 +1,4 @@
+import io
 import logging
 from pathlib import Path
 from typing import Dict, Optional
@@ -42,30 +43,42 @@ class PDFParser:
 
         try:
             reader = PdfReader(file_path)
-            text_parts = []
+            buf = io.StringIO()
+            write = buf.write
+            separator = ""
 
+            # Write pages straight into one buffer instead of per-page strings
             for page_num, page in enumerate(reader.pages, 1):
                 page_text = page.extract_text()
                 if page_text:
-                    text_parts.append(f"[Page {page_num}]\n{page_text}")
+                    write(separator)
+                    write("[Page ")
+                    write(str(page_num))
+                    write("]\n")
+                    write(page_text)
+                    separator = "\n\n"
 
-            content = "\n\n".join(text_parts)
+            content = buf.getvalue()
+            page_count = len(reader.pages)
 
             metadata = {
                 "filename": path.name,
                 "file_type": "pdf",
-                "page_count": len(reader.pages),
+                "page_count": page_count,
                 "file_size": path.stat().st_size
             }
 
-            # Extract PDF metadata if available
-            if reader.metadata:
-                if reader.metadata.title:
-                    metadata["title"] = reader.metadata.title
-                if reader.metadata.author:
-                    metadata["author"] = reader.metadata.author
-
-            logger.info(f"Parsed PDF: {path.name}, {len(reader.pages)} pages")
+            # Extract PDF metadata if available (read the info dict once)
+            pdf_metadata = reader.metadata
+            if pdf_metadata is not None:
+                title = getattr(pdf_metadata, "title", None)
+                author = getattr(pdf_metadata, "author", None)
+                if title:
+                    metadata["title"] = title
+                if author:
+                    metadata["author"] = author
+
+            logger.info(f"Parsed PDF: {path.name}, {page_count} pages")
 
             return {
                 "success": True,
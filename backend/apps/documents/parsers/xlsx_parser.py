@@ -1,14 +1,27 @@
 import logging
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Tuple
 
 from openpyxl import load_workbook
 
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+def _calamine_cell_text(cell) -> str:
+    # Calamine returns every number as a float; keep whole numbers like openpyxl does
+    if isinstance(cell, float) and cell.is_integer():
+        return str(int(cell))
+    return str(cell)
+
+
 class XLSXParser:
-    """Parser for Excel spreadsheets using openpyxl."""
+    """Parser for Excel spreadsheets using python-calamine (openpyxl fallback)."""
 
     SUPPORTED_EXTENSIONS = ['.xlsx', '.xlsm']
 
@@ -41,42 +54,23 @@ class XLSXParser:
             }
 
         try:
-            wb = load_workbook(file_path, read_only=True, data_only=True)
-            sheets_content = []
-            total_rows = 0
-
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                rows = []
-
-                for row in sheet.iter_rows(values_only=True):
-                    # Filter out completely empty rows
-                    if any(cell is not None for cell in row):
-                        row_text = " | ".join(
-                            str(cell) if cell is not None else ""
-                            for cell in row
-                        )
-                        rows.append(row_text)
-                        total_rows += 1
-
-                if rows:
-                    sheet_content = f"[Sheet: {sheet_name}]\n" + "\n".join(rows)
-                    sheets_content.append(sheet_content)
-
-            wb.close()
+            if CALAMINE_AVAILABLE:
+                sheets_content, total_rows, sheet_names = self._read_calamine(file_path)
+            else:
+                sheets_content, total_rows, sheet_names = self._read_openpyxl(file_path)
 
             content = "\n\n".join(sheets_content)
 
             metadata = {
                 "filename": path.name,
                 "file_type": "xlsx",
-                "sheet_count": len(wb.sheetnames),
-                "sheet_names": wb.sheetnames,
+                "sheet_count": len(sheet_names),
+                "sheet_names": sheet_names,
                 "total_rows": total_rows,
                 "file_size": path.stat().st_size
             }
 
-            logger.info(f"Parsed XLSX: {path.name}, {len(wb.sheetnames)} sheets, {total_rows} rows")
+            logger.info(f"Parsed XLSX: {path.name}, {len(sheet_names)} sheets, {total_rows} rows")
 
             return {
                 "success": True,
@@ -94,6 +88,54 @@ class XLSXParser:
                 "metadata": {"filename": path.name}
             }
 
+    def _read_calamine(self, file_path: str) -> Tuple[List[str], int, List[str]]:
+        """Read sheets with python-calamine (Rust reader, near-constant memory)."""
+        wb = CalamineWorkbook.from_path(file_path)
+        sheet_names = list(wb.sheet_names)
+        sheets_content = []
+        total_rows = 0
+
+        for sheet_name in sheet_names:
+            rows = []
+
+            # Calamine returns empty cells as "" rather than None
+            for row in wb.get_sheet_by_name(sheet_name).to_python(skip_empty_area=True):
+                if any(cell != "" for cell in row):
+                    rows.append(" | ".join(map(_calamine_cell_text, row)))
+                    total_rows += 1
+
+            if rows:
+                sheets_content.append(f"[Sheet: {sheet_name}]\n" + "\n".join(rows))
+
+        return sheets_content, total_rows, sheet_names
+
+    def _read_openpyxl(self, file_path: str) -> Tuple[List[str], int, List[str]]:
+        """Read sheets with openpyxl in read-only mode."""
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        # Capture once; the workbook is closed before returning
+        sheet_names = list(wb.sheetnames)
+        sheets_content = []
+        total_rows = 0
+
+        for sheet_name in sheet_names:
+            sheet = wb[sheet_name]
+            rows = []
+
+            for row in sheet.iter_rows(values_only=True):
+                row_text = " | ".join(map(str, ["" if cell is None else cell for cell in row]))
+                # Filter out completely empty rows
+                if row_text.replace(" | ", "").strip():
+                    rows.append(row_text)
+                    total_rows += 1
+
+            if rows:
+                sheet_content = f"[Sheet: {sheet_name}]\n" + "\n".join(rows)
+                sheets_content.append(sheet_content)
+
+        wb.close()
+
+        return sheets_content, total_rows, sheet_names
+
 
 def parse_xlsx(file_path: str) -> Dict:
     """Convenience function for XLSX parsing."""
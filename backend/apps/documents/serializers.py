@@ -18,6 +18,21 @@ class DocumentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class DocumentListSerializer(serializers.ModelSerializer):
+    """Lightweight Document serializer for list views (omits metadata JSON)."""
+    file_size_display = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Document
+        fields = [
+            'id', 'filename', 'original_filename', 'file_type',
+            'file_size', 'file_size_display', 'document_key',
+            'file_url', 'is_vectorized', 'is_persistent', 'chunk_count',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class FileUploadSerializer(serializers.Serializer):
     """Serializer for file upload."""
     file = serializers.FileField()
@@ -1,7 +1,8 @@
 import logging
-from typing import List, Dict, Optional
-
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -23,16 +24,91 @@ class DocumentSplitter:
             chunk_overlap: Number of characters to overlap between chunks
             separators: Custom separators for splitting (optional)
         """
+        # Each chunk must advance past the previous one's overlap
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.separators = separators or ["\n\n", "\n", ". ", " ", ""]
 
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=self.separators,
-            length_function=len
+        # Non-empty separators in priority order; "" means hard character cuts.
+        # One compiled alternation finds every break point in a single pass.
+        # Longest alternatives go first so "\n\n" is not consumed as two "\n".
+        self._break_separators = [sep for sep in self.separators if sep]
+        self._group_priority = sorted(
+            range(len(self._break_separators)),
+            key=lambda i: -len(self._break_separators[i])
         )
+        self._pattern = (
+            re.compile("|".join(
+                f"({re.escape(self._break_separators[i])})" for i in self._group_priority
+            ))
+            if self._break_separators else None
+        )
+
+    def _break_positions(self, text: str) -> Tuple[List[List[int]], List[int]]:
+        """
+        Collect end offsets of separator matches, per separator and merged.
+
+        Returns:
+            Tuple of (positions per separator in priority order, all positions sorted)
+        """
+        by_separator = [[] for _ in self._break_separators]
+        merged = []
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                end = match.end()
+                by_separator[self._group_priority[match.lastindex - 1]].append(end)
+                merged.append(end)
+        return by_separator, merged
+
+    def _find_cut(self, by_separator: List[List[int]], start: int, end: int) -> int:
+        """Pick the highest-priority break in (start, end], preferring full chunks."""
+        min_cut = start + self.chunk_size // 2
+        for floor in (min_cut, start):
+            for positions in by_separator:
+                idx = bisect_right(positions, end) - 1
+                if idx >= 0 and positions[idx] > floor:
+                    return positions[idx]
+        return end
+
+    def _split(self, text: str) -> List[str]:
+        """Greedy single-pass split on precomputed break positions."""
+        by_separator, merged = self._break_positions(text)
+        length = len(text)
+        chunks = []
+        start = 0
+
+        while start < length:
+            end = start + self.chunk_size
+            if end >= length:
+                cut = length
+            else:
+                cut = self._find_cut(by_separator, start, end)
+
+            piece = text[start:cut].strip()
+            if piece:
+                chunks.append(piece)
+            if cut >= length:
+                break
+
+            # Start the next chunk on a break point inside the overlap window,
+            # or mid-text when the window has none (character-level fallback)
+            next_start = cut
+            if self.chunk_overlap > 0:
+                window_start = max(cut - self.chunk_overlap, start + 1)
+                idx = bisect_left(merged, window_start)
+                if idx < len(merged) and merged[idx] < cut:
+                    next_start = merged[idx]
+                elif window_start < cut:
+                    next_start = window_start
+            start = next_start
+
+        return chunks
 
     def split_text(
         self,
@@ -53,15 +129,15 @@ class DocumentSplitter:
             return []
 
         try:
-            chunks = self.splitter.split_text(text)
+            chunks = self._split(text)
+            chunk_count = len(chunks)
+            base_metadata = metadata or {}
 
             result = []
             for i, chunk in enumerate(chunks):
-                chunk_metadata = {
-                    "chunk_index": i,
-                    "chunk_count": len(chunks),
-                    **(metadata or {})
-                }
+                chunk_metadata = base_metadata.copy()
+                chunk_metadata["chunk_index"] = i
+                chunk_metadata["chunk_count"] = chunk_count
 
                 result.append({
                     "content": chunk,
@@ -96,6 +172,10 @@ class DocumentSplitter:
         Returns:
             List of chunks with full metadata
         """
+        if not content or not content.strip():
+            logger.info(f"Empty document {document_key}, skipping split")
+            return []
+
         base_metadata = {
             "document_key": document_key,
             "filename": filename,
@@ -113,6 +193,20 @@ class DocumentSplitter:
         return chunks
 
 
+@lru_cache(maxsize=32)
+def _get_splitter(
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: Optional[Tuple[str, ...]] = None
+) -> DocumentSplitter:
+    """Get a cached splitter; splitting is stateless so instances are shareable."""
+    return DocumentSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=list(separators) if separators else None
+    )
+
+
 def split_text(
     text: str,
     chunk_size: int = 1000,
@@ -120,7 +214,7 @@ def split_text(
     metadata: Optional[Dict] = None
 ) -> List[Dict]:
     """Convenience function for text splitting."""
-    splitter = DocumentSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    splitter = _get_splitter(chunk_size, chunk_overlap)
     return splitter.split_text(text, metadata)
 
 
@@ -133,5 +227,5 @@ def split_document(
     chunk_overlap: int = 200
 ) -> List[Dict]:
     """Convenience function for document splitting."""
-    splitter = DocumentSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    splitter = _get_splitter(chunk_size, chunk_overlap)
     return splitter.split_document(content, document_key, filename, file_type)
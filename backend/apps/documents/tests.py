@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+
+from apps.documents.services.text_splitter import DocumentSplitter
+
+
+class DocumentSplitterTests(SimpleTestCase):
+    def test_chunks_never_exceed_chunk_size(self):
+        splitter = DocumentSplitter(chunk_size=30, chunk_overlap=10)
+        text = " ".join(f"word{i}" for i in range(200))
+        chunks = splitter._split(text)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 30)
+
+    def test_hard_cuts_without_separators(self):
+        splitter = DocumentSplitter(chunk_size=10, chunk_overlap=0)
+        self.assertEqual(splitter._split("a" * 25), ["a" * 10, "a" * 10, "a" * 5])
+
+    def test_consecutive_chunks_overlap(self):
+        splitter = DocumentSplitter(chunk_size=30, chunk_overlap=10)
+        chunks = splitter._split(" ".join(f"word{i}" for i in range(30)))
+        for previous, current in zip(chunks, chunks[1:]):
+            # The next chunk starts on a word break inside the overlap window
+            self.assertEqual(previous.split()[-1], current.split()[0])
+
+    def test_prefers_paragraph_break_over_sentence_break(self):
+        splitter = DocumentSplitter(chunk_size=30, chunk_overlap=0)
+        self.assertEqual(
+            splitter._split("First sentence. Still first\n\nSecond part. And more words"),
+            ["First sentence. Still first", "Second part. And more words"]
+        )
+
+    def test_falls_back_to_sentence_break(self):
+        splitter = DocumentSplitter(chunk_size=20, chunk_overlap=0)
+        self.assertEqual(splitter._split("Intro line. More text")[0], "Intro line.")
+
+    def test_rejects_overlap_not_smaller_than_chunk_size(self):
+        with self.assertRaises(ValueError):
+            DocumentSplitter(chunk_size=10, chunk_overlap=10)
+        with self.assertRaises(ValueError):
+            DocumentSplitter(chunk_size=10, chunk_overlap=20)
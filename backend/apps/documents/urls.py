@@ -4,6 +4,7 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.upload_document, name='upload_document'),
+    path('upload/bulk/', views.upload_documents_bulk, name='upload_documents_bulk'),
     path('', views.list_documents, name='list_documents'),
     path('<uuid:document_id>/', views.get_document, name='get_document'),
     path('<uuid:document_id>/delete/', views.delete_document, name='delete_document'),
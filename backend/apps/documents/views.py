@@ -1,18 +1,22 @@
 import logging
 import os
+import shutil
 import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 from django.conf import settings
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Document
-from .serializers import DocumentSerializer, FileUploadSerializer
+from .models import Document, EmbeddingBatch
+from .serializers import DocumentListSerializer, DocumentSerializer, FileUploadSerializer
 from apps.chatbot.tools import process_and_vectorize_file
 from core.clients.supabase_client import delete_documents_by_key, upload_file_to_storage, delete_file_from_storage
 
@@ -21,21 +25,122 @@ logger = logging.getLogger(__name__)
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.xlsm', '.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif', '.txt'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+COPY_BUFFER_SIZE = 1 << 20  # 1 MB blocks when spooling uploads to disk
+BULK_UPLOAD_WORKERS = 4
+
+
+# Columns needed by DocumentListSerializer; skips the metadata JSON blob
+DOCUMENT_LIST_FIELDS = (
+    'id', 'filename', 'original_filename', 'file_type', 'file_size',
+    'document_key', 'file_url', 'is_vectorized', 'is_persistent',
+    'chunk_count', 'created_at', 'updated_at',
+)
+
+IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif'})
+
+# Extension to Document.file_type
+FILE_TYPE_MAP = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.xlsx': 'xlsx',
+    '.xlsm': 'xlsx',
+    '.txt': 'txt',
+}
+
+# Extension to MIME type for Supabase Storage uploads
+CONTENT_TYPE_MAP = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
+    '.txt': 'text/plain',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.tiff': 'image/tiff',
+}
+
+
+class DocumentPagination(PageNumberPagination):
+    """Page-number pagination for the document list."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
 
 
 def get_file_type(filename: str) -> str:
     """Get file type from extension."""
-    ext = Path(filename).suffix.lower()
-    type_map = {
-        '.pdf': 'pdf',
-        '.docx': 'docx',
-        '.xlsx': 'xlsx',
-        '.xlsm': 'xlsx',
-        '.txt': 'txt',
-    }
-    if ext in ['.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif']:
+    dot = filename.rfind('.')
+    ext = filename[dot:].lower() if dot >= 0 else ''
+    if ext in IMAGE_EXTENSIONS:
         return 'image'
-    return type_map.get(ext, 'other')
+    return FILE_TYPE_MAP.get(ext, 'other')
+
+
+def _validate_upload(uploaded_file) -> Optional[str]:
+    """Return an error message if the file fails extension/size checks."""
+    ext = Path(uploaded_file.name).suffix.lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        return f"File type not allowed: {ext}"
+    if uploaded_file.size > MAX_FILE_SIZE:
+        return f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+    return None
+
+
+def _store_and_vectorize(uploaded_file, ext: str, user_id: str, persist: bool) -> Tuple[Dict, str, str]:
+    """
+    Spool an upload to disk, then upload it to storage and vectorize it.
+
+    Returns:
+        Tuple of (vectorization result, file_url, storage_path)
+    """
+    # Save file temporarily
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext, buffering=COPY_BUFFER_SIZE) as tmp:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file.file, tmp, length=COPY_BUFFER_SIZE)
+        tmp_path = tmp.name
+
+    # Upload to Supabase Storage for later viewing
+    content_type = CONTENT_TYPE_MAP.get(ext, 'application/octet-stream')
+
+    # Storage upload and vectorization are independent I/O-bound stages,
+    # so run them concurrently. Storage is optional - continues even if it fails.
+    file_url = ''
+    storage_path = ''
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            storage_future = executor.submit(
+                upload_file_to_storage,
+                file_path=tmp_path,
+                file_name=uploaded_file.name,
+                user_id=user_id,
+                content_type=content_type
+            )
+            vectorize_future = executor.submit(
+                process_and_vectorize_file,
+                file_path=tmp_path,
+                user_id=user_id,
+                persist_embeddings=persist
+            )
+
+            try:
+                storage_result = storage_future.result()
+                logger.info(f"Storage upload result: {storage_result}")
+                if storage_result:
+                    file_url = storage_result.get('file_url', '')
+                    storage_path = storage_result.get('storage_path', '')
+                    logger.info(f"Got file_url: {file_url}")
+            except Exception as storage_error:
+                logger.warning(f"Storage upload failed (continuing without): {storage_error}")
+
+            result = vectorize_future.result()
+    finally:
+        # Clean up temp file once both stages are done with it
+        os.unlink(tmp_path)
+
+    return result, file_url, storage_path
 
 
 @api_view(['POST'])
@@ -61,72 +166,21 @@ def upload_document(request):
     uploaded_file = serializer.validated_data['file']
     persist = serializer.validated_data.get('persist_embeddings', True)
 
-    # Validate file extension
-    ext = Path(uploaded_file.name).suffix.lower()
-    if ext not in ALLOWED_EXTENSIONS:
+    # Validate file extension and size
+    error = _validate_upload(uploaded_file)
+    if error:
         return Response({
             "success": False,
-            "message": f"File type not allowed: {ext}"
+            "message": error
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    # Validate file size
-    if uploaded_file.size > MAX_FILE_SIZE:
-        return Response({
-            "success": False,
-            "message": f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
-        }, status=status.HTTP_400_BAD_REQUEST)
+    ext = Path(uploaded_file.name).suffix.lower()
 
     try:
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-            for chunk in uploaded_file.chunks():
-                tmp.write(chunk)
-            tmp_path = tmp.name
-
-        # Upload to Supabase Storage for later viewing
-        content_type_map = {
-            '.pdf': 'application/pdf',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            '.xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
-            '.txt': 'text/plain',
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.gif': 'image/gif',
-            '.bmp': 'image/bmp',
-            '.tiff': 'image/tiff',
-        }
-        content_type = content_type_map.get(ext, 'application/octet-stream')
-
-        # Try to upload to storage (optional - continues even if fails)
-        file_url = ''
-        storage_path = ''
-        try:
-            storage_result = upload_file_to_storage(
-                file_path=tmp_path,
-                file_name=uploaded_file.name,
-                user_id=str(request.user.id),
-                content_type=content_type
-            )
-            logger.info(f"Storage upload result: {storage_result}")
-            if storage_result:
-                file_url = storage_result.get('file_url', '')
-                storage_path = storage_result.get('storage_path', '')
-                logger.info(f"Got file_url: {file_url}")
-        except Exception as storage_error:
-            logger.warning(f"Storage upload failed (continuing without): {storage_error}")
-
-        # Process and vectorize
-        result = process_and_vectorize_file(
-            file_path=tmp_path,
-            user_id=str(request.user.id),
-            persist_embeddings=persist
+        result, file_url, storage_path = _store_and_vectorize(
+            uploaded_file, ext, str(request.user.id), persist
         )
 
-        # Clean up temp file
-        os.unlink(tmp_path)
-
         if not result.get('success'):
             return Response({
                 "success": False,
@@ -169,20 +223,138 @@ def upload_document(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def upload_documents_bulk(request):
+    """
+    Upload and process several documents in one request.
+
+    Files are processed concurrently and their Document rows are inserted
+    with a single bulk_create.
+
+    POST /api/documents/upload/bulk/
+    Form data:
+        - files: The files to upload (repeated field)
+        - persist_embeddings: bool (default: true)
+    """
+    uploaded_files = request.FILES.getlist('files')
+    if not uploaded_files:
+        return Response({
+            "success": False,
+            "message": "No files provided"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    persist = str(request.data.get('persist_embeddings', 'true')).lower() not in ('false', '0')
+    user_id = str(request.user.id)
+
+    errors = []
+    valid_files = []
+    for uploaded_file in uploaded_files:
+        error = _validate_upload(uploaded_file)
+        if error:
+            errors.append({"filename": uploaded_file.name, "message": error})
+        else:
+            valid_files.append(uploaded_file)
+
+    documents = []
+    with ThreadPoolExecutor(max_workers=BULK_UPLOAD_WORKERS) as executor:
+        futures = [
+            (
+                uploaded_file,
+                executor.submit(
+                    _store_and_vectorize,
+                    uploaded_file,
+                    Path(uploaded_file.name).suffix.lower(),
+                    user_id,
+                    persist
+                )
+            )
+            for uploaded_file in valid_files
+        ]
+
+        for uploaded_file, future in futures:
+            try:
+                result, file_url, storage_path = future.result()
+            except Exception as e:
+                logger.error(f"Bulk upload error for {uploaded_file.name}: {str(e)}")
+                errors.append({"filename": uploaded_file.name, "message": str(e)})
+                continue
+
+            if not result.get('success'):
+                errors.append({
+                    "filename": uploaded_file.name,
+                    "message": result.get('error', 'Processing failed')
+                })
+                continue
+
+            ext = Path(uploaded_file.name).suffix.lower()
+            documents.append(Document(
+                user=request.user,
+                filename=f"{result['document_key']}{ext}",
+                original_filename=uploaded_file.name,
+                file_type=get_file_type(uploaded_file.name),
+                file_size=uploaded_file.size,
+                storage_path=storage_path,
+                file_url=file_url,
+                document_key=result['document_key'],
+                is_vectorized=result.get('vectorized', False),
+                is_persistent=persist,
+                chunk_count=result.get('chunk_count', 0),
+                metadata=result.get('metadata', {})
+            ))
+
+    try:
+        Document.objects.bulk_create(documents, batch_size=100)
+    except Exception as e:
+        logger.error(f"Bulk create error: {str(e)}")
+        return Response({
+            "success": False,
+            "message": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        "success": bool(documents),
+        "documents": [
+            {
+                "document_id": str(document.id),
+                "document_key": document.document_key,
+                "filename": document.original_filename,
+                "file_url": document.file_url,
+                "file_type": document.file_type,
+                "file_size": document.file_size,
+                "chunk_count": document.chunk_count,
+                "vectorized": document.is_vectorized
+            }
+            for document in documents
+        ],
+        "errors": errors
+    }, status=status.HTTP_201_CREATED if documents else status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_documents(request):
     """
     List user's persistent documents (excludes session-only uploads).
 
-    GET /api/documents/
+    GET /api/documents/?page=1&page_size=50
     """
     # Only show persistent documents (is_persistent=True)
-    documents = Document.objects.filter(user=request.user, is_persistent=True)
-    serializer = DocumentSerializer(documents, many=True)
+    documents = Document.objects.filter(
+        user=request.user,
+        is_persistent=True
+    ).only(*DOCUMENT_LIST_FIELDS).order_by('-created_at')
+
+    paginator = DocumentPagination()
+    page = paginator.paginate_queryset(documents, request)
+    serializer = DocumentListSerializer(page, many=True)
 
     return Response({
         "success": True,
+        "count": paginator.page.paginator.count,
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link(),
         "documents": serializer.data
     })
 
@@ -230,6 +402,9 @@ def delete_document(request, document_id):
     user_id = str(request.user.id)
     storage_path = document.storage_path
 
+    # Drop any pending batch first so its embeddings are never stored
+    EmbeddingBatch.objects.filter(document_key=document_key).delete()
+
     # Delete vectors from Supabase
     vector_result = delete_documents_by_key(document_key, user_id)
     if not vector_result.get("success"):
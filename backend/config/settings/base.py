@@ -17,7 +17,7 @@ from settings import settings as env_settings
 # Core Django settings from Pydantic
 SECRET_KEY = env_settings.DJANGO_SECRET_KEY
 DEBUG = bool(env_settings.DJANGO_DEBUG)
-ALLOWED_HOSTS = [h.strip() for h in env_settings.DJANGO_ALLOWED_HOSTS.split(",") if h.strip()]
+ALLOWED_HOSTS = env_settings.allowed_hosts_list
 
 # Application definition
 INSTALLED_APPS = [
@@ -126,7 +126,7 @@ SIMPLE_JWT = {
 
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG
-CORS_ALLOWED_ORIGINS = [o.strip() for o in env_settings.CORS_ALLOWED_ORIGINS.split(",") if o.strip()]
+CORS_ALLOWED_ORIGINS = env_settings.cors_origins_list
 
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
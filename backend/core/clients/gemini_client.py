@@ -1,42 +1,204 @@
+import atexit
+import hashlib
+import io
+import json
 import logging
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import lru_cache
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import httpx
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from openai import OpenAI
 
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from core.clients.resilience import call_with_retry, openai_breaker
 from settings import settings
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+
 # Embedding dimension for OpenAI text-embedding-3-small
 EMBEDDING_DIMENSION = 1536
 
+# Batch API: break-even size and inputs per request line
+BATCH_EMBED_MIN_TEXTS = 500
+BATCH_EMBED_INPUTS_PER_REQUEST = 100
+
+# Query embedding cache: in-process LRU size, shared Redis TTL (seconds)
+QUERY_CACHE_SIZE = 4096
+QUERY_CACHE_TTL = 7 * 24 * 3600
+
+# Shared connection pool for all OpenAI clients
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=100)
+HTTP_TIMEOUT = httpx.Timeout(30.0)
+
+
+@lru_cache
+def get_http_client() -> httpx.Client:
+    """Get the shared keep-alive (HTTP/2 when available) sync HTTP client."""
+    client = httpx.Client(http2=HTTP2_AVAILABLE, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    atexit.register(client.close)
+    return client
+
 
 @lru_cache
 def get_embeddings_model() -> OpenAIEmbeddings:
-    """Get cached OpenAI embeddings model."""
+    """Get cached OpenAI embeddings model (retried by call_with_retry, not the SDK)."""
     return OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        openai_api_key=settings.OPENAI_API_KEY
+        model=EMBEDDING_MODEL,
+        openai_api_key=settings.OPENAI_API_KEY,
+        max_retries=0,
+        http_client=get_http_client()
     )
 
 
 @lru_cache
 def get_chat_model(temperature: float = 0.7) -> ChatOpenAI:
-    """Get cached OpenAI chat model."""
+    """Get cached OpenAI chat model (retried by call_with_retry, not the SDK)."""
     return ChatOpenAI(
         model="gpt-4o-mini",
         openai_api_key=settings.OPENAI_API_KEY,
-        temperature=temperature
+        temperature=temperature,
+        max_retries=0,
+        http_client=get_http_client()
     )
 
 
+@lru_cache
+def get_openai_client() -> OpenAI:
+    """Get cached raw OpenAI client (used for the Batch API)."""
+    return OpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client())
+
+
+@lru_cache
+def get_redis_client() -> Optional["redis.Redis"]:
+    """Get cached Redis client for the shared query cache, if configured."""
+    if not (REDIS_AVAILABLE and settings.REDIS_URL):
+        return None
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+class _QueryEmbeddingCache:
+    """
+    Content-addressed embedding cache for repeated queries.
+
+    Keys are 16-byte blake2b digests of the query text, so memory stays
+    bounded regardless of query length. A per-process LRU sits in front of
+    an optional Redis layer shared by all workers (fp16-packed values).
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                return list(embedding)
+
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            packed = client.get(b"emb:" + key.hex().encode())
+        except Exception as e:
+            logger.warning(f"Query cache read failed: {str(e)}")
+            return None
+        if packed is None:
+            return None
+
+        embedding = struct.unpack(f"{len(packed) // 2}e", packed)
+        self._remember(key, embedding)
+        return list(embedding)
+
+    def set(self, key: bytes, embedding: List[float]) -> None:
+        self._remember(key, tuple(embedding))
+
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            packed = struct.pack(f"{len(embedding)}e", *embedding)
+            client.setex(b"emb:" + key.hex().encode(), QUERY_CACHE_TTL, packed)
+        except Exception as e:
+            logger.warning(f"Query cache write failed: {str(e)}")
+
+    def _remember(self, key: bytes, embedding: Tuple[float, ...]) -> None:
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+_query_cache = _QueryEmbeddingCache()
+
+# Embeddings computed during the current request (see request_embedding_scope)
+_request_embeddings: ContextVar[Optional[Dict[bytes, List[float]]]] = ContextVar(
+    "request_embeddings", default=None
+)
+
+
+@contextmanager
+def request_embedding_scope() -> Iterator[None]:
+    """
+    Memoize query embeddings for the duration of one request.
+
+    Every embed_query for the same text inside the scope (retrieval, rerank,
+    web-search augmentation) reuses the first result without touching the
+    shared caches.
+    """
+    token = _request_embeddings.set({})
+    try:
+        yield
+    finally:
+        _request_embeddings.reset(token)
+
+
 def embed_query(text: str) -> List[float]:
-    """Embed a single query text and return 1536-dim vector."""
+    """Embed a single query text and return 1536-dim vector (cached by content)."""
+    cache_key = _query_cache.key(text)
+    request_cache = _request_embeddings.get()
+    if request_cache is not None and cache_key in request_cache:
+        return request_cache[cache_key]
+
+    cached = _query_cache.get(cache_key)
+    if cached is not None:
+        if request_cache is not None:
+            request_cache[cache_key] = cached
+        return cached
+
     try:
         model = get_embeddings_model()
-        embedding = model.embed_query(text)
+        embedding = call_with_retry(openai_breaker, model.embed_query, text)
         logger.info(f"Generated embedding with {len(embedding)} dimensions")
+        _query_cache.set(cache_key, embedding)
+        if request_cache is not None:
+            request_cache[cache_key] = embedding
         return embedding
     except Exception as e:
         logger.error(f"Error generating embedding: {str(e)}")
@@ -47,7 +209,7 @@ def embed_documents(texts: List[str]) -> List[List[float]]:
     """Embed multiple documents and return list of 1536-dim vectors."""
     try:
         model = get_embeddings_model()
-        embeddings = model.embed_documents(texts)
+        embeddings = call_with_retry(openai_breaker, model.embed_documents, texts)
         logger.info(f"Generated {len(embeddings)} embeddings")
         return embeddings
     except Exception as e:
@@ -55,11 +217,95 @@ def embed_documents(texts: List[str]) -> List[List[float]]:
         raise
 
 
+def submit_embedding_batch(texts: List[str], display_name: str = "document-ingest") -> str:
+    """
+    Submit texts to the OpenAI Batch API (50% of interactive pricing).
+
+    Batches finish within the 24h completion window, so callers record the
+    batch id and collect the results later (see collect_embedding_batches).
+
+    Args:
+        texts: Texts to embed
+        display_name: Label stored in the batch metadata
+
+    Returns:
+        Batch id, to be passed to get_embedding_batch_results
+    """
+    lines = []
+    for start in range(0, len(texts), BATCH_EMBED_INPUTS_PER_REQUEST):
+        lines.append(json.dumps({
+            "custom_id": str(start),
+            "method": "POST",
+            "url": "/v1/embeddings",
+            "body": {
+                "model": EMBEDDING_MODEL,
+                "input": texts[start:start + BATCH_EMBED_INPUTS_PER_REQUEST]
+            }
+        }))
+
+    client = get_openai_client()
+    batch_file = client.files.create(
+        file=(f"{display_name}.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/embeddings",
+        completion_window="24h",
+        metadata={"display_name": display_name, "text_count": str(len(texts))}
+    )
+    logger.info(f"Submitted embedding batch {batch.id} ({len(texts)} texts)")
+    return batch.id
+
+
+def get_embedding_batch_results(batch_id: str) -> Optional[List[List[float]]]:
+    """
+    Fetch the embeddings of a finished batch.
+
+    Returns:
+        Embeddings in input order, or None while the batch is still running
+
+    Raises:
+        RuntimeError: If the batch failed, expired, was cancelled or has no
+            embedding for some of its inputs
+    """
+    client = get_openai_client()
+    batch = client.batches.retrieve(batch_id)
+
+    if batch.status in ("failed", "expired", "cancelled", "cancelling"):
+        raise RuntimeError(f"Embedding batch {batch_id} ended with status {batch.status}")
+    if batch.status != "completed":
+        return None
+    # Failed requests are written to the error file, not the output file
+    if batch.error_file_id or not batch.output_file_id:
+        raise RuntimeError(f"Embedding batch {batch_id} completed with failed requests")
+
+    results = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                raise RuntimeError(f"Embedding batch {batch_id} request {record.get('custom_id')} failed")
+            start = int(record["custom_id"])
+            for item in response["body"]["data"]:
+                results[start + item["index"]] = item["embedding"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise RuntimeError(f"Embedding batch {batch_id} has a malformed output line: {str(e)}") from e
+
+    text_count = int((batch.metadata or {}).get("text_count", len(results)))
+    if sorted(results) != list(range(text_count)):
+        raise RuntimeError(f"Embedding batch {batch_id} returned {len(results)} of {text_count} embeddings")
+    return [results[i] for i in range(text_count)]
+
+
 def generate_response(prompt: str, temperature: float = 0.7) -> str:
     """Generate a response using OpenAI chat model."""
     try:
         model = get_chat_model(temperature)
-        response = model.invoke(prompt)
+        response = call_with_retry(openai_breaker, model.invoke, prompt)
         return response.content
     except Exception as e:
         logger.error(f"Error generating response: {str(e)}")
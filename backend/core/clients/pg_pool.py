@@ -0,0 +1,91 @@
+import json
+import logging
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+try:
+    from pgvector.asyncpg import register_vector
+    PGVECTOR_AVAILABLE = True
+except ImportError:
+    PGVECTOR_AVAILABLE = False
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+POOL_COMMAND_TIMEOUT = 60
+
+
+async def _init_connection(conn) -> None:
+    """
+    Register codecs so vectors and jsonb round-trip without manual encoding.
+
+    pgvector>=0.3.0 also registers the halfvec codec, so embeddings bound to
+    the halfvec column are sent in binary and converted to fp16 by Postgres.
+    """
+    if PGVECTOR_AVAILABLE:
+        await register_vector(conn)
+    await conn.set_type_codec(
+        'jsonb',
+        encoder=json.dumps,
+        decoder=json.loads,
+        schema='pg_catalog'
+    )
+
+
+async def _ping_connection(conn) -> None:
+    """Pre-ping on acquire so stale pooler connections fail fast."""
+    await conn.fetchval("SELECT 1")
+
+
+async def create_pool() -> "asyncpg.Pool":
+    """
+    Create an asyncpg pool for the running event loop.
+
+    Used by scripts that run their own event loop (cleanup_cron). The pool is
+    bound to that loop, so the caller closes it before the loop ends; the
+    sync Django views use the Django connection and supabase-py instead.
+    """
+    if not ASYNCPG_AVAILABLE:
+        raise RuntimeError("asyncpg not installed. Install with: pip install asyncpg pgvector")
+
+    pool = await asyncpg.create_pool(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME,
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=settings.DB_POOL_RECYCLE,
+        command_timeout=POOL_COMMAND_TIMEOUT,
+        # Supavisor transaction mode cannot share prepared statements
+        statement_cache_size=0,
+        init=_init_connection,
+        setup=_ping_connection
+    )
+    logger.info(
+        f"Created asyncpg pool ({settings.DB_POOL_MIN_SIZE}-{settings.DB_POOL_MAX_SIZE} connections)"
+    )
+    return pool
+
+
+def acquire(pool: "asyncpg.Pool"):
+    """Acquire a connection, waiting at most DB_POOL_TIMEOUT seconds."""
+    return pool.acquire(timeout=settings.DB_POOL_TIMEOUT)
+
+
+async def health_check(pool: "asyncpg.Pool") -> bool:
+    """Verify the database is reachable through the pool."""
+    try:
+        await pool.fetchval("SELECT 1", timeout=settings.DB_POOL_TIMEOUT)
+        logger.info("Postgres pool health check passed")
+        return True
+    except Exception as e:
+        logger.error(f"Postgres pool health check failed: {str(e)}")
+        return False
+
@@ -0,0 +1,72 @@
+import logging
+from typing import Callable, TypeVar
+
+import httpx
+import openai
+import pybreaker
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors worth retrying: the upstream was slow, unreachable, rate limiting or failing (5xx)
+TRANSIENT_ERRORS = (
+    httpx.TimeoutException,
+    httpx.ConnectError,
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class _LogListener(pybreaker.CircuitBreakerListener):
+    def state_change(self, cb, old_state, new_state):
+        logger.warning(f"Circuit breaker '{cb.name}': {old_state.name} -> {new_state.name}")
+
+
+def _make_breaker(name: str) -> pybreaker.CircuitBreaker:
+    """Breaker that only counts transient upstream errors as failures."""
+    return pybreaker.CircuitBreaker(
+        fail_max=10,
+        reset_timeout=30,
+        exclude=[lambda e: not isinstance(e, TRANSIENT_ERRORS)],
+        listeners=[_LogListener()],
+        name=name,
+    )
+
+
+# One breaker per upstream
+openai_breaker = _make_breaker("openai")
+supabase_breaker = _make_breaker("supabase")
+
+
+# Up to 3 attempts with jittered exponential backoff (0.1s .. 2s)
+_retry_transient = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.1, max=2),
+    retry=retry_if_exception_type(TRANSIENT_ERRORS),
+    reraise=True,
+)
+
+
+def call_with_retry(breaker: pybreaker.CircuitBreaker, func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Call func through a circuit breaker, retrying transient errors.
+
+    Up to 3 attempts with jittered exponential backoff (0.1s .. 2s). While the
+    breaker is open, calls fail fast with pybreaker.CircuitBreakerError
+    instead of adding load to a degraded upstream.
+    """
+    @_retry_transient
+    def attempt():
+        return breaker.call(func, *args, **kwargs)
+
+    return attempt()
+
@@ -1,18 +1,30 @@
 import logging
+import uuid
 from functools import lru_cache
 from typing import List, Dict, Optional
 
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 
+from core.clients.resilience import call_with_retry, supabase_breaker
 from settings import settings
 
 logger = logging.getLogger(__name__)
 
+SUPABASE_TIMEOUT = 30
+
 
 @lru_cache
 def get_supabase_client() -> Client:
-    """Get cached Supabase client instance."""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    """Get cached Supabase client instance (keeps its HTTP connections alive)."""
+    return create_client(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_KEY,
+        options=ClientOptions(
+            postgrest_client_timeout=SUPABASE_TIMEOUT,
+            storage_client_timeout=SUPABASE_TIMEOUT
+        )
+    )
 
 
 def health_check() -> bool:
@@ -34,15 +46,19 @@ def match_documents(
     match_threshold: float = 0.1,  # Lowered default threshold
     match_count: int = 10
 ) -> List[Dict]:
-    """Perform semantic search on documents."""
+    """
+    Perform semantic search on all of a user's documents.
+
+    thread_id is accepted for backwards compatibility but not used: a second
+    thread-filtered RPC on an empty result doubled round-trips and could only
+    return a subset of the user-wide search.
+    """
     try:
         client = get_supabase_client()
 
-        # Use match_documents_by_user which doesn't filter by thread_id
-        # This ensures all user documents are searched
         logger.info(f"Searching documents for user_id={user_id}")
 
-        result = client.rpc(
+        result = call_with_retry(supabase_breaker, client.rpc(
             'match_documents_by_user',
             {
                 'query_embedding': query_embedding,
@@ -50,31 +66,11 @@ def match_documents(
                 'match_threshold': match_threshold,
                 'match_count': match_count
             }
-        ).execute()
+        ).execute)
 
-        if result.data:
-            logger.info(f"match_documents_by_user returned {len(result.data)} results")
-            return result.data
-
-        # Fallback to original match_documents with thread_id
-        logger.info("Trying match_documents with thread_id filter")
-        fallback_result = client.rpc(
-            'match_documents',
-            {
-                'query_embedding': query_embedding,
-                'filter_user_id': user_id,
-                'filter_thread_id': thread_id,
-                'match_threshold': match_threshold,
-                'match_count': match_count
-            }
-        ).execute()
-
-        if fallback_result.data:
-            logger.info(f"match_documents returned {len(fallback_result.data)} results")
-            return fallback_result.data
-
-        logger.info("No documents found in either search method")
-        return []
+        results = result.data or []
+        logger.info(f"match_documents_by_user returned {len(results)} results")
+        return results
     except Exception as e:
         logger.error(f"Error in match_documents: {str(e)}")
         return []
@@ -113,6 +109,29 @@ def upsert_document(
         return False
 
 
+def upsert_documents(rows: List[Dict]) -> int:
+    """
+    Upsert many document rows in a single request.
+
+    Args:
+        rows: Dicts with the same columns upsert_document writes
+
+    Returns:
+        Number of rows upserted (0 on error)
+    """
+    if not rows:
+        return 0
+
+    try:
+        client = get_supabase_client()
+        client.table('documents').upsert(rows).execute()
+        logger.info(f"Successfully upserted {len(rows)} documents")
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error upserting {len(rows)} documents: {str(e)}")
+        return 0
+
+
 def delete_documents_by_key(document_key: str, user_id: str) -> Dict:
     """
     Delete all document chunks associated with a document key.
@@ -175,23 +194,20 @@ def upload_file_to_storage(
     try:
         client = get_supabase_client()
 
-        # Create unique path: user_id/timestamp_filename
-        import time
-        timestamp = int(time.time())
-        storage_path = f"{user_id}/{timestamp}_{file_name}"
-
-        # Read file content
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
+        # Create unique path: user_id/<uuid>_filename (second-resolution
+        # timestamps collided for concurrent uploads of the same file)
+        storage_path = f"{user_id}/{uuid.uuid4().hex}_{file_name}"
 
         logger.info(f"Uploading to bucket '{STORAGE_BUCKET}', path: {storage_path}")
 
-        # Upload to storage
-        result = client.storage.from_(STORAGE_BUCKET).upload(
-            path=storage_path,
-            file=file_content,
-            file_options={"content-type": content_type}
-        )
+        # Upload to storage; passing the file object lets httpx stream it in
+        # chunks instead of holding the whole file in memory
+        with open(file_path, 'rb') as f:
+            result = client.storage.from_(STORAGE_BUCKET).upload(
+                path=storage_path,
+                file=f,
+                file_options={"content-type": content_type}
+            )
 
         logger.info(f"Upload result: {result}")
 
@@ -223,5 +239,16 @@ def delete_file_from_storage(storage_path: str) -> bool:
         return False
 
 
-# Global client instance
-supabase_client = get_supabase_client()
+def delete_files_from_storage(storage_paths: List[str]) -> bool:
+    """Delete several files from Supabase Storage in one request."""
+    if not storage_paths:
+        return True
+
+    try:
+        client = get_supabase_client()
+        client.storage.from_(STORAGE_BUCKET).remove(storage_paths)
+        logger.info(f"Deleted {len(storage_paths)} files from storage")
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting {len(storage_paths)} files from storage: {str(e)}")
+        return False
@@ -1,6 +1,7 @@
 """Management command to verify Supabase connection."""
 from django.core.management.base import BaseCommand
 
+from core.clients.gemini_client import EMBEDDING_DIMENSION
 from core.clients.supabase_client import health_check, get_supabase_client
 
 
@@ -14,13 +15,13 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS("Supabase connection successful!"))
 
             # Test RPC function
-            self.stdout.write("\nTesting match_documents RPC...")
+            self.stdout.write("\nTesting match_documents_by_user RPC...")
             try:
                 client = get_supabase_client()
-                # Test with empty embedding (768 dimensions for Gemini)
-                test_embedding = [0.0] * 768
+                # Test with empty embedding
+                test_embedding = [0.0] * EMBEDDING_DIMENSION
                 result = client.rpc(
-                    'match_documents',
+                    'match_documents_by_user',
                     {
                         'query_embedding': test_embedding,
                         'filter_user_id': '00000000-0000-0000-0000-000000000000',
@@ -28,9 +29,9 @@ class Command(BaseCommand):
                         'match_count': 1
                     }
                 ).execute()
-                self.stdout.write(self.style.SUCCESS("  match_documents RPC works!"))
+                self.stdout.write(self.style.SUCCESS("  match_documents_by_user RPC works!"))
             except Exception as e:
-                self.stdout.write(self.style.WARNING(f"  match_documents RPC failed: {str(e)}"))
+                self.stdout.write(self.style.WARNING(f"  match_documents_by_user RPC failed: {str(e)}"))
         else:
             self.stdout.write(self.style.ERROR("Supabase connection failed!"))
             self.stdout.write("\nMake sure you have:")
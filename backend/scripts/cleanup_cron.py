@@ -13,6 +13,7 @@ Environment variables required:
     - SUPABASE_URL
     - SUPABASE_SERVICE_KEY
 """
+import asyncio
 import os
 import sys
 import django
@@ -25,55 +26,97 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.production')
 django.setup()
 
 from datetime import timedelta
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from apps.documents.models import Document
-from core.clients.supabase_client import delete_documents_by_key, delete_file_from_storage
+from apps.documents.models import Document, EmbeddingBatch
+from core.clients.pg_pool import acquire, create_pool
+from core.clients.supabase_client import delete_files_from_storage
 
+# Storage paths removed per request
+STORAGE_DELETE_BATCH_SIZE = 100
 
-def cleanup_session_documents(hours: int = 24) -> dict:
+
+def _expired_records(cutoff_time):
+    return Document.objects.filter(
+        is_persistent=False,
+        created_at__lt=cutoff_time
+    )
+
+
+def _count_expired_records(cutoff_time) -> int:
+    return _expired_records(cutoff_time).count()
+
+
+def _delete_expired_batches(cutoff_time) -> int:
+    """Delete pending embedding batches of expired documents; returns the count."""
+    expired_keys = _expired_records(cutoff_time).values('document_key')
+    deleted, _ = EmbeddingBatch.objects.filter(document_key__in=expired_keys).delete()
+    return deleted
+
+
+def _delete_expired_records(cutoff_time) -> int:
+    """Delete expired session Document rows in one query; returns the count."""
+    deleted, _ = _expired_records(cutoff_time).delete()
+    return deleted
+
+
+async def cleanup_session_documents(hours: int = 24) -> dict:
     """
     Clean up session-only documents older than specified hours.
 
+    Pending embedding batches are dropped first, vector chunks are deleted by
+    the cleanup_expired_documents SQL function in a single round-trip, files
+    are removed in batches and Django records with one bulk delete.
+
     Returns:
-        dict with deleted_count and errors
+        dict with deleted_count, total_found and errors
     """
     cutoff_time = timezone.now() - timedelta(hours=hours)
 
-    session_docs = Document.objects.filter(
-        is_persistent=False,
-        created_at__lt=cutoff_time
-    )
-
-    count = session_docs.count()
+    count = await sync_to_async(_count_expired_records)(cutoff_time)
 
     if count == 0:
         print(f"[CLEANUP] No session documents older than {hours} hours found.")
-        return {"deleted_count": 0, "errors": []}
+        return {"deleted_count": 0, "total_found": 0, "errors": []}
 
     print(f"[CLEANUP] Found {count} session documents to clean up.")
 
-    deleted_count = 0
     errors = []
 
-    for doc in session_docs:
-        try:
-            # Delete vectors from Supabase
-            delete_documents_by_key(doc.document_key, str(doc.user_id))
-
-            # Delete file from storage if exists
-            if doc.storage_path:
-                try:
-                    delete_file_from_storage(doc.storage_path)
-                except Exception as e:
-                    print(f"[CLEANUP] Warning: Failed to delete storage file: {e}")
+    # Drop pending embedding batches first so collect_embedding_batches
+    # can't store vectors for documents that are about to be removed
+    try:
+        await sync_to_async(_delete_expired_batches)(cutoff_time)
+    except Exception as e:
+        print(f"[CLEANUP] Error deleting pending embedding batches: {e}")
+        return {"deleted_count": 0, "total_found": count, "errors": [str(e)]}
 
-            # Delete Django record
-            doc.delete()
-            deleted_count += 1
-
-        except Exception as e:
-            errors.append(f"{doc.original_filename}: {str(e)}")
-            print(f"[CLEANUP] Error deleting {doc.document_key}: {e}")
+    try:
+        pool = await create_pool()
+        try:
+            async with acquire(pool) as conn:
+                rows = await conn.fetch("SELECT * FROM cleanup_expired_documents($1)", cutoff_time)
+        finally:
+            await pool.close()
+        storage_paths = [row[0] for row in rows]
+    except Exception as e:
+        print(f"[CLEANUP] Error deleting expired vectors: {e}")
+        return {"deleted_count": 0, "total_found": count, "errors": [str(e)]}
+
+    # Delete files from storage, one request per batch of paths
+    for start in range(0, len(storage_paths), STORAGE_DELETE_BATCH_SIZE):
+        batch = storage_paths[start:start + STORAGE_DELETE_BATCH_SIZE]
+        if not delete_files_from_storage(batch):
+            errors.append(f"Failed to delete storage files {batch[0]} .. {batch[-1]}")
+            print(f"[CLEANUP] Warning: Failed to delete {len(batch)} storage files")
+
+    # Delete Django records
+    try:
+        deleted_count = await sync_to_async(_delete_expired_records)(cutoff_time)
+    except Exception as e:
+        errors.append(f"Error deleting document records: {str(e)}")
+        print(f"[CLEANUP] Error deleting document records: {e}")
+        deleted_count = 0
 
     print(f"[CLEANUP] Successfully deleted {deleted_count}/{count} session documents.")
 
@@ -86,7 +129,7 @@ def cleanup_session_documents(hours: int = 24) -> dict:
 
 if __name__ == "__main__":
     print("[CLEANUP] Starting session document cleanup...")
-    result = cleanup_session_documents(hours=24)
+    result = asyncio.run(cleanup_session_documents(hours=24))
     print(f"[CLEANUP] Complete. Deleted: {result['deleted_count']}")
 
     if result['errors']:
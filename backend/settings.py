@@ -1,6 +1,13 @@
+from functools import cached_property
+from typing import List
+
 from pydantic_settings import BaseSettings
 
 
+def _split_csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 class Settings(BaseSettings):
     # Django Core
     DJANGO_SECRET_KEY: str
@@ -13,6 +20,11 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     DB_PORT: int
+    # asyncpg pool; defaults stay under Supavisor's per-tenant connection cap
+    DB_POOL_MIN_SIZE: int = 3
+    DB_POOL_MAX_SIZE: int = 5
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
 
     # Supabase
     SUPABASE_URL: str
@@ -20,6 +32,11 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str
+    # Route large ingestion jobs through the (half-price) Batch API
+    EMBEDDING_BATCH_ENABLED: bool = False
+
+    # Redis (optional, shared query-embedding cache)
+    REDIS_URL: str = ""
 
     # Tavily (Web Search)
     TAVILY_API_KEY: str
@@ -27,6 +44,14 @@ class Settings(BaseSettings):
     # CORS
     CORS_ALLOWED_ORIGINS: str
 
+    @cached_property
+    def allowed_hosts_list(self) -> List[str]:
+        return _split_csv(self.DJANGO_ALLOWED_HOSTS)
+
+    @cached_property
+    def cors_origins_list(self) -> List[str]:
+        return _split_csv(self.CORS_ALLOWED_ORIGINS)
+
     model_config = {
         "env_file": ".env",
         "case_sensitive": True,
@@ -1,6 +1,6 @@
 import logging
 from langchain_community.tools import Tool
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from settings import settings
 import json
@@ -15,14 +15,93 @@ from rag.schemas.database_schema import BANK_STATEMENT_DB_SCHEMA
 from promptlayer import PromptLayer
 from extraction.clients.promptlayer_client import PromptLayerClient
 from rag.utils.response_templates import FALLBACK_TEMPLATES
+from rag.utils.prompt_cache import build_cacheable_messages
+from rag.utils.llm_cache import build_llm_cache
+from rag.utils.http_clients import get_http_client
+from cachetools import TTLCache
+import threading
+from dataclasses import dataclass
+
+# Generated SQL keyed by normalized (query, company_id, limit); skips even the
+# LLM cache lookup for exact repeats
+_GENERATED_SQL_CACHE = TTLCache(maxsize=256, ttl=300)
+_GENERATED_SQL_CACHE_LOCK = threading.Lock()
+
+DEFAULT_SQL_CHECK_MODEL = "gpt-4o-mini"
+
+# Rows pulled per round-trip when reading query results
+FETCH_BATCH_SIZE = 500
+
+# Result rows included in the formatter prompt; the rest are summarized by count
+CONTEXT_MAX_ROWS = 20
+
+# Successful pipeline results are reused for this long, so a query that goes
+# through both the tool and process_query in one request only runs once
+PIPELINE_CACHE_TTL = 30
+
+
+@dataclass
+class PipelineResult:
+    """Outcome of one generate SQL -> execute -> answer run."""
+    sql: str
+    rows: List[Dict]
+    answer: str
+    error: Optional[str] = None
+
 
 class BankStatementDetailsAgent:
     """Agent for querying and processing bank statement details from the database."""   
+    _DOUBLE_QUOTED = re.compile(r'"([^"]+)"(?:\."([^"]+)")?')
+    _UNQUOTED = re.compile(r'([a-z0-9_]+)(?:\.([a-z0-9_]+))?')
+    _SELECT_RE = re.compile(r'^\s*select\s+')
+    # Markdown code fences and line/inline comments, removed in one pass
+    _SQL_CLEAN_RE = re.compile(r'```(?:sql)?|(?:--|#)[^\n]*', re.IGNORECASE)
+    # Known generation bugs: company filter on documents.id, ambiguous SELECT id
+    _NEEDS_FIX_RE = re.compile(r'\b(?:documents|d)\.id\s*=|\bselect\s+id\b', re.IGNORECASE)
+    _LIMIT_RE = re.compile(r'\blimit\b', re.IGNORECASE)
+    # Generation fix-ups: `documents.id = <value>` / `d.id = <value>` and a bare `SELECT id`
+    _DOCUMENT_ID_FILTER_RE = re.compile(r"\b(documents|d)\.id\s*=\s*'?([\w-]+)'?")
+    _SELECT_ID_RE = re.compile(r'\bSELECT id\b')
+    # Prefix keywords (sp_, xp_, pg_, information_schema) have no trailing \b so
+    # they still match identifiers like pg_catalog
+    _DANGEROUS_RE = re.compile(
+        r'\b(insert|update|delete|drop|alter|truncate|create|grant|revoke|union|exec|execute)\b'
+        r'|\b(sp_|xp_|information_schema|pg_)'
+        r'|--|/\*|\*/'
+    )
+
     def __init__(self):
         self.DB_SCHEMA = BANK_STATEMENT_DB_SCHEMA
         self.logger = logging.getLogger(__name__)
-        self.llm = ChatOpenAI(api_key=settings.OPENAI_API_KEY, model=settings.OPENAI_MODEL_V2)
+        # The schema is fixed at runtime, so derive its prompt text and the
+        # table allow-list once
+        self._schema_text_cached = self._build_schema_text()
+        self._allowed_tables = frozenset(
+            table_info["table"].lower() for table_info in self.DB_SCHEMA.values()
+        ) | {"documents"}  # Explicitly allow the documents table
+        self._allowed_table_patterns = frozenset(
+            pattern
+            for table in self._allowed_tables
+            for pattern in (table, f'"{table}"', f"'{table}'")
+        )
+        self.llm = ChatOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.OPENAI_MODEL_V2,
+            streaming=True,
+            cache=build_llm_cache(),
+            http_client=get_http_client()
+        )
+        # SQL syntax checking is mechanical; a small model is enough
+        self.llm_cheap = ChatOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            model=getattr(settings, "SQL_CHECK_MODEL", None) or DEFAULT_SQL_CHECK_MODEL,
+            cache=build_llm_cache(),
+            http_client=get_http_client()
+        )
         self.pl_client = PromptLayerClient()
+        self.pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
+        self._pipeline_cache = TTLCache(maxsize=64, ttl=PIPELINE_CACHE_TTL)
+        self._pipeline_cache_lock = threading.Lock()
         
         self.SQL_CHECK_PROMPT_ID = settings.SQL_CHECK_PROMPT
         self.BANK_STATEMENT_QUERY_PROMPT_ID = settings.BANK_QUERY_PROMPT
@@ -34,7 +113,24 @@ class BankStatementDetailsAgent:
             description="Queries the 'bank_statement_details' table based on the provided query and optional company_id."
         )
 
+    def _invoke_llm(self, messages: List[Dict], prompt_id: str, llm: ChatOpenAI = None):
+        """
+        Invoke the LLM with a per-prompt cache key so requests sharing a
+        system prefix are routed to the same OpenAI prompt cache.
+        """
+        response = (llm or self.llm).invoke(
+            input=messages,
+            extra_body={"prompt_cache_key": f"bank_stmt_{prompt_id}"}
+        )
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached_tokens = usage.get("input_token_details", {}).get("cache_read", 0)
+        self.logger.debug(f"Prompt {prompt_id}: {cached_tokens}/{usage.get('input_tokens', 0)} input tokens cached")
+        return response
+
     def _format_schema_for_prompt(self) -> str:
+        return self._schema_text_cached
+
+    def _build_schema_text(self) -> str:
         schema_text = []
         for table_name, table_info in self.DB_SCHEMA.items():
             schema_text.append(f"- Table: {table_info['table']}")
@@ -58,25 +154,7 @@ class BankStatementDetailsAgent:
         Returns:
             str: Cleaned SQL query
         """
-        sql_query = sql_query.replace("```sql", "").replace("```", "")
-        sql_query = sql_query.strip()
-        
-        # Remove semicolons at the end of the query
-        if sql_query.endswith(';'):
-            sql_query = sql_query[:-1]
-        
-        lines = sql_query.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            if line.strip().startswith('--') or line.strip().startswith('#'):
-                continue
-            if '--' in line:
-                line = line.split('--')[0]
-            if '#' in line:
-                line = line.split('#')[0]
-            cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
+        return self._SQL_CLEAN_RE.sub('', sql_query).strip().rstrip(';')
 
     def _check_sql_query(self, query: str) -> Dict:
         """
@@ -88,51 +166,33 @@ class BankStatementDetailsAgent:
         Returns:
             Dict: Result with corrected query and success status
         """
-        schema_text = self._get_db_schema()
-        
-        input_variables = {
-            "schema": schema_text,
-            "query": query
-        }
-
         try:
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
-                self.SQL_CHECK_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
-                }
-            )
-
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
-
-            prompt = system_message if system_message else f"Check this SQL query: {query}"
-            
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages
-            )
-            
-            corrected_query = self._clean_sql_query(response.content.strip())
-            if corrected_query != query:
-                if "documents.id = " in corrected_query:
-                    corrected_query = corrected_query.replace(
-                        "documents.id = ", 
-                        "documents.company_id = "
-                    )
-            return {"success": True, "query": corrected_query}
+            messages = self._check_messages(query)
+            response = self._invoke_llm(messages, self.SQL_CHECK_PROMPT_ID, llm=self.llm_cheap)
+            return {"success": True, "query": self._corrected_query(query, response.content)}
         except Exception as e:
             self.logger.error(f"Error checking SQL query: {str(e)}")
             return {"success": False, "error": str(e), "query": query}
+
+    def _check_messages(self, query: str) -> List[Dict]:
+        schema_text = self._get_db_schema()
+        return build_cacheable_messages(
+            self.pl,
+            self.SQL_CHECK_PROMPT_ID,
+            static_variables={"schema": schema_text},
+            dynamic_variables={"query": query},
+            fallback_prompt=f"Check this SQL query: {query}"
+        )
+
+    def _corrected_query(self, query: str, response_content: str) -> str:
+        corrected_query = self._clean_sql_query(response_content.strip())
+        if corrected_query != query:
+            if "documents.id = " in corrected_query:
+                corrected_query = corrected_query.replace(
+                    "documents.id = ", 
+                    "documents.company_id = "
+                )
+        return corrected_query
             
     def _generate_query_from_schema(self, user_query: str, company_id: str = None, limit: int = 100) -> str:
         """
@@ -146,83 +206,74 @@ class BankStatementDetailsAgent:
         Returns:
             str: Generated SQL query
         """
-        # Format the schema for the prompt
-        schema_text = self._format_schema_for_prompt()
-        
-        input_variables = {
-            "schema": schema_text,
-            "query": user_query,
-            "limit": limit,
-            "company_id": company_id or "Not specified"
-        }
+        cache_key = (" ".join(user_query.lower().split()), company_id, limit)
+        with _GENERATED_SQL_CACHE_LOCK:
+            cached_sql = _GENERATED_SQL_CACHE.get(cache_key)
+        if cached_sql is not None:
+            self.logger.info("Using cached SQL for repeated query")
+            return cached_sql
 
-        pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-        prompt_template = pl.templates.get(
-            self.SQL_BANK_STATEMENT_GENERATION_PROMPT_ID,
-            {
-                "provider": "openai",
-                "input_variables": input_variables,
-                "label": settings.ENV,
-            }
-        )
+        sql_query = self._build_query_from_schema(user_query, company_id, limit)
 
-        system_message = None
-        for message in prompt_template['llm_kwargs']['messages']:
-            if message['role'] == 'system':
-                system_message = message['content']
-                break
+        with _GENERATED_SQL_CACHE_LOCK:
+            _GENERATED_SQL_CACHE[cache_key] = sql_query
+        return sql_query
 
-        prompt = system_message if system_message else f"Generate SQL for this query: {user_query}"
-        
-        messages = [
-            {"role": "system", "content": prompt}
-        ]
-        
-        response = self.llm.invoke(
-            input=messages
-        )
+    def _build_query_from_schema(self, user_query: str, company_id: str = None, limit: int = 100) -> str:
+        """Generate, check and fix up the SQL for a query (uncached)."""
+        messages = self._generation_messages(user_query, company_id, limit)
+        response = self._invoke_llm(messages, self.SQL_BANK_STATEMENT_GENERATION_PROMPT_ID)
         
         sql_query = response.content.strip()
         sql_query = self._clean_sql_query(sql_query)
         
-        # Check and correct the SQL query
-        check_result = self._check_sql_query(sql_query)
-        if check_result["success"]:
-            sql_query = check_result["query"]
+        # Check and correct the SQL query, unless it already passes validation
+        # and has none of the known generation bugs
+        if not self._validate_sql_query(sql_query) or self._needs_fix(sql_query):
+            check_result = self._check_sql_query(sql_query)
+            if check_result["success"]:
+                sql_query = check_result["query"]
+        
+        return self._fix_generated_sql(sql_query, company_id, limit)
+
+    def _generation_messages(self, user_query: str, company_id: str, limit: int) -> List[Dict]:
+        # Format the schema for the prompt
+        schema_text = self._format_schema_for_prompt()
         
+        return build_cacheable_messages(
+            self.pl,
+            self.SQL_BANK_STATEMENT_GENERATION_PROMPT_ID,
+            static_variables={"schema": schema_text, "limit": limit},
+            dynamic_variables={
+                "query": user_query,
+                "company_id": company_id or "Not specified"
+            },
+            fallback_prompt=f"Generate SQL for this query: {user_query}"
+        )
+
+    def _needs_fix(self, sql_query: str) -> bool:
+        """Return True if the query shows one of the known generation bugs."""
+        return bool(self._NEEDS_FIX_RE.search(sql_query)) or not self._LIMIT_RE.search(sql_query)
+
+    def _fix_generated_sql(self, sql_query: str, company_id: str, limit: int) -> str:
+        """Apply quick fixes for common generation errors and enforce a LIMIT."""
         # Quick fix for common errors
         if company_id:
-            # Fix incorrect company_id references
-            if "documents.id = '{}'".format(company_id) in sql_query:
-                sql_query = sql_query.replace(
-                    "documents.id = '{}'".format(company_id),
-                    "documents.company_id = '{}'".format(company_id)
-                )
-            elif "documents.id = {}".format(company_id) in sql_query:
-                sql_query = sql_query.replace(
-                    "documents.id = {}".format(company_id),
-                    "documents.company_id = '{}'".format(company_id)
-                )
-            elif "WHERE d.id = " in sql_query:
-                sql_query = sql_query.replace(
-                    "WHERE d.id = {}".format(company_id),
-                    "WHERE d.company_id = '{}'".format(company_id)
-                )
-                sql_query = sql_query.replace(
-                    "WHERE d.id = '{}'".format(company_id),
-                    "WHERE d.company_id = '{}'".format(company_id)
-                )
+            # Fix incorrect company_id references (documents.id / d.id compared to the company ID)
+            company_id = str(company_id)
+            sql_query = self._DOCUMENT_ID_FILTER_RE.sub(
+                lambda match: f"{match.group(1)}.company_id = '{company_id}'"
+                if match.group(2) == company_id else match.group(0),
+                sql_query
+            )
         
         # Fix ambiguous column references
-        if "SELECT id" in sql_query:
-            sql_query = sql_query.replace("SELECT id", "SELECT bank_statement_details.id")
+        sql_query = self._SELECT_ID_RE.sub("SELECT bank_statement_details.id", sql_query)
         
-        # Ensure there's no trailing semicolon which would cause problems when adding LIMIT
-        if sql_query.endswith(';'):
-            sql_query = sql_query[:-1]
-        
-        # Add LIMIT if not already present
-        if "LIMIT" not in sql_query.upper():
+        # Strip any trailing semicolon (it would break an appended LIMIT) and
+        # add LIMIT if not already present
+        sql_query = sql_query.rstrip().rstrip(';')
+        if not self._LIMIT_RE.search(sql_query):
             sql_query += f" LIMIT {limit}"
                 
         return sql_query
@@ -237,24 +288,19 @@ class BankStatementDetailsAgent:
         Returns:
             bool: True if the query is safe, False otherwise
         """
-        normalized_query = " " + " ".join(sql_query.lower().strip().split()) + " "
+        # One casefolded pass; table names extracted below are already lowercase
+        normalized_query = " " + " ".join(sql_query.casefold().split()) + " "
                 
         # Check if it's a SELECT statement (accounting for COUNT, DISTINCT, etc.)
-        if not re.search(r'^\s*select\s+', normalized_query.lower().strip()):
+        if not self._SELECT_RE.search(normalized_query):
             self.logger.error("SQL validation failed: Query must be a SELECT statement")
             return False
         
         # Check for dangerous keywords
-        dangerous_keywords = [
-            " insert ", " update ", " delete ", " drop ", " alter ", " truncate ",
-            " create ", " grant ", " revoke ", " union ", "--", "/*", "*/", "xp_",
-            " exec ", " execute ", " sp_", " information_schema", " pg_"
-        ]
-        
-        for keyword in dangerous_keywords:
-            if keyword in normalized_query:
-                self.logger.error(f"SQL validation failed: Query contains dangerous keyword: {keyword}")
-                return False
+        dangerous_match = self._DANGEROUS_RE.search(normalized_query)
+        if dangerous_match:
+            self.logger.error(f"SQL validation failed: Query contains dangerous keyword: {dangerous_match.group(0)}")
+            return False
         
         # Check for FROM clause (with more flexible pattern matching)
         if " from " not in normalized_query:
@@ -262,12 +308,8 @@ class BankStatementDetailsAgent:
             return False
         
         # Extract and validate tables
-        allowed_tables = [table_info["table"].lower() for table_info in self.DB_SCHEMA.values()]
-        allowed_tables.append("documents")  # Explicitly allow the documents table
-        
-        allowed_table_patterns = []
-        for table in allowed_tables:
-            allowed_table_patterns.extend([table, f'"{table}"', f"'{table}'"])
+        allowed_tables = self._allowed_tables
+        allowed_table_patterns = self._allowed_table_patterns
         
         try:
             parts = normalized_query.split(" from ")
@@ -304,9 +346,6 @@ class BankStatementDetailsAgent:
             
             extracted_tables = []
             
-            double_quoted_pattern = re.compile(r'"([^"]+)"(?:\."([^"]+)")?')
-            unquoted_pattern = re.compile(r'([a-z0-9_]+)(?:\.([a-z0-9_]+))?')
-            
             for expr in table_expressions:
                 table_name = expr.strip()
                 
@@ -317,8 +356,8 @@ class BankStatementDetailsAgent:
                     # Table might have an alias without AS keyword
                     table_name = table_name.split()[0].strip()
                 
-                double_quoted_match = double_quoted_pattern.search(table_name)
-                unquoted_match = unquoted_pattern.search(table_name)
+                double_quoted_match = self._DOUBLE_QUOTED.search(table_name)
+                unquoted_match = self._UNQUOTED.search(table_name)
                 
                 if double_quoted_match:
                     groups = double_quoted_match.groups()
@@ -332,7 +371,7 @@ class BankStatementDetailsAgent:
             valid_tables = False
             for table in extracted_tables:
                 # Clean the table name for comparison
-                clean_table = table.replace('"', '').replace("'", "").lower()
+                clean_table = table.replace('"', '').replace("'", "")
                 
                 # Check if it's in our list of allowed tables
                 if clean_table in allowed_tables:
@@ -340,7 +379,7 @@ class BankStatementDetailsAgent:
                     break
                 
                 # Check if the quoted version is in our allowed table patterns
-                if table.lower() in [p.lower() for p in allowed_table_patterns]:
+                if table in allowed_table_patterns:
                     valid_tables = True
                     break
             
@@ -358,14 +397,55 @@ class BankStatementDetailsAgent:
             # If we can't parse it but it has SELECT and FROM, allow it (fail open for usability)
             return True
 
+    def _bind_company_id(self, sql_query: str, company_id: str = None) -> Tuple[str, Optional[tuple]]:
+        """
+        Replace the company_id literal in generated SQL with a bound parameter.
+        
+        Lets the driver handle quoting instead of trusting the interpolated
+        literal, and makes the statement text identical across companies.
+        
+        Args:
+            sql_query (str): Generated SQL query
+            company_id (str): Company ID the query was generated for
+            
+        Returns:
+            Tuple[str, Optional[tuple]]: SQL with %s placeholders and its params,
+            or the query unchanged and None if there is nothing to bind
+        """
+        if not company_id:
+            return sql_query, None
+        literal = "'{}'".format(company_id).replace('%', '%%')
+        # Escape literal % (e.g. LIKE patterns) now that the driver will format the query
+        escaped_query = sql_query.replace('%', '%%')
+        count = escaped_query.count(literal)
+        if not count:
+            return sql_query, None
+        return escaped_query.replace(literal, '%s'), (company_id,) * count
+
     def _execute_sql_query(self, sql_query: str, params: tuple = None) -> List[Dict]:
+        """
+        Run a validated SELECT and return its rows with JSON-ready values.
+        
+        Rows are fetched in batches and coerced as they arrive, so only one
+        copy of the result set is built.
+        """
         try:
             if not self._validate_sql_query(sql_query):
                 return [{"error": "Invalid SQL query: security validation failed"}]
             with connection.cursor() as cursor:
                 cursor.execute(sql_query, params) if params else cursor.execute(sql_query)
                 columns = [col[0] for col in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                coerce = self._coerce
+                rows = []
+                while True:
+                    batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+                    if not batch:
+                        break
+                    rows.extend(
+                        {column: coerce(value) for column, value in zip(columns, row)}
+                        for row in batch
+                    )
+                return rows
         except Exception as e:
             self.logger.error(f"SQL query execution failed: {str(e)}")
             return [{"error": f"Query failed: {str(e)}"}]
@@ -382,89 +462,126 @@ class BankStatementDetailsAgent:
             str: Response with bank statement details
         """
         self.logger.info(f"Executing bank statement query tool with query: {query}, company_id: {company_id}")
+        return self._run_pipeline(query, company_id).answer
+
+    def _run_pipeline(self, query: str, company_id: str = None) -> PipelineResult:
+        """
+        Generate SQL, execute it and produce the natural-language answer.
+        
+        Shared by the tool and process_query. Successful results are kept
+        for a few seconds, so a query that goes through both within one
+        request runs only once.
         
+        Args:
+            query (str): The user's query
+            company_id (str): Optional company ID to filter results
+            
+        Returns:
+            PipelineResult: SQL, result rows and answer (error set if the query failed)
+        """
+        cache_key = (" ".join(query.lower().split()), company_id)
+        with self._pipeline_cache_lock:
+            cached = self._pipeline_cache.get(cache_key)
+        if cached is not None:
+            self.logger.info("Using pipeline result from this request")
+            return cached
+
         # Step 1: Generate SQL query from the user's natural language query
         sql_query = self._generate_query_from_schema(query, company_id)
         
-        # Step 2: Execute the SQL query
-        results = self._execute_sql_query(sql_query)
+        # Step 2: Execute the SQL query; rows come back already formatted for JSON
+        rows = self._execute_sql_query(*self._bind_company_id(sql_query, company_id))
         
-        # Step 3: Check for errors in the query execution
-        if len(results) == 1 and "error" in results[0]:
-            error_message = results[0]["error"]
-            self.logger.error(f"Error executing SQL query: {error_message}")
-            return f"Error retrieving bank statement details: {error_message}"
-        
-        # Step 4: Format the results
-        formatted_results = []
-        for row in results:
-            formatted_row = {}
-            for key, value in row.items():
-                if isinstance(value, (datetime.date, datetime.datetime)):
-                    formatted_row[key] = value.strftime('%Y-%m-%d')
-                elif isinstance(value, decimal.Decimal):
-                    formatted_row[key] = float(value)
-                else:
-                    formatted_row[key] = value
-            formatted_results.append(formatted_row)
+        # Step 3: Check for errors or no results
+        result = self._early_result(sql_query, rows)
+        if result is not None:
+            return result
         
-        # Step 5: If no results found, return a simple message
-        if not formatted_results:
-            return FALLBACK_TEMPLATES["BANK_STATEMENT_NOT_FOUND"]
+        # Step 4: Generate a human-readable response using LLM
+        try:
+            messages = self._response_messages(query, company_id, sql_query, rows)
+            answer = self._invoke_llm(messages, self.BANK_STATEMENT_QUERY_PROMPT_ID).content
+        except Exception as e:
+            self.logger.error(f"Error generating response from query results: {str(e)}")
+            answer = self._fallback_summary(rows)
+
+        result = PipelineResult(sql=sql_query, rows=rows, answer=answer)
+        with self._pipeline_cache_lock:
+            self._pipeline_cache[cache_key] = result
+        return result
+
+    def _early_result(self, sql_query: str, rows: List[Dict]) -> Optional[PipelineResult]:
+        """Return the result for a failed or empty query, or None if there are rows to format."""
+        if len(rows) == 1 and "error" in rows[0]:
+            error_message = rows[0]["error"]
+            self.logger.error(f"Error executing SQL query: {error_message}")
+            return PipelineResult(
+                sql=sql_query,
+                rows=[],
+                answer=f"Error retrieving bank statement details: {error_message}",
+                error=error_message
+            )
+        if not rows:
+            return PipelineResult(sql=sql_query, rows=[], answer=FALLBACK_TEMPLATES["BANK_STATEMENT_NOT_FOUND"])
+        return None
+
+    @staticmethod
+    def _coerce(value):
+        """Convert dates and decimals in result cells to JSON-serializable values."""
+        # Exact type checks are cheaper than isinstance for the common
+        # str/int/None cells; DB drivers return these exact types
+        value_type = type(value)
+        if value_type is datetime.date:
+            return value.isoformat()
+        if value_type is datetime.datetime:
+            return value.strftime('%Y-%m-%d')
+        if value_type is decimal.Decimal:
+            return float(value)
+        return value
+
+    def _results_context(self, formatted_results: List[Dict]) -> str:
+        """
+        Serialize result rows compactly for the formatter prompt.
         
-        # Step 6: Generate a human-readable response using LLM
+        Only the first CONTEXT_MAX_ROWS rows are included, followed by a
+        one-line note with the number of rows left out.
+        """
+        context = json.dumps(formatted_results[:CONTEXT_MAX_ROWS], separators=(",", ":"), default=str)
+        remaining = len(formatted_results) - CONTEXT_MAX_ROWS
+        if remaining > 0:
+            context += f"\n...and {remaining} more rows ({len(formatted_results)} in total)"
+        return context
+
+    def _response_messages(self, query: str, company_id: str, sql_query: str, formatted_results: List[Dict]) -> List[Dict]:
+        context = self._results_context(formatted_results)
         input_variables = {
             "query": query,
             "company_id": company_id or "Not specified",
             "sql_query": sql_query,
-            "context": json.dumps(formatted_results, indent=2)
+            "context": context
         }
-        
-        try:
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
-                self.BANK_STATEMENT_QUERY_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
-                }
-            )
-
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
+        return build_cacheable_messages(
+            self.pl,
+            self.BANK_STATEMENT_QUERY_PROMPT_ID,
+            static_variables={},
+            dynamic_variables=input_variables,
+            fallback_prompt=f"Format these results: {context}"
+        )
 
-            prompt = system_message if system_message else f"Format these results: {json.dumps(formatted_results)}"
-            
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages
-            )
-            
-            return response.content
-            
-        except Exception as e:
-            self.logger.error(f"Error generating response from query results: {str(e)}")
-            
-            # Fallback: Generate simple response manually if LLM fails
-            if len(formatted_results) == 1:
-                # Single bank statement response
-                statement = formatted_results[0]
-                acc_num = statement.get('account_number', 'Unknown')
-                currency = statement.get('currency', '')
-                balance = statement.get('closing_balance', 'Not available')
-                date = statement.get('start_date', 'Not available')
-                return f"Found bank statement {acc_num} from {date} with closing balance {balance} {currency}."
-            else:
-                # Multiple bank statement summary
-                count = len(formatted_results)
-                return f"Found {count} bank statements matching your query. The account numbers are: {', '.join([r.get('account_number', 'Unknown') for r in formatted_results if 'account_number' in r])}."
+    def _fallback_summary(self, formatted_results: List[Dict]) -> str:
+        """Generate a simple response manually if the LLM fails."""
+        if len(formatted_results) == 1:
+            # Single bank statement response
+            statement = formatted_results[0]
+            acc_num = statement.get('account_number', 'Unknown')
+            currency = statement.get('currency', '')
+            balance = statement.get('closing_balance', 'Not available')
+            date = statement.get('start_date', 'Not available')
+            return f"Found bank statement {acc_num} from {date} with closing balance {balance} {currency}."
+        else:
+            # Multiple bank statement summary
+            count = len(formatted_results)
+            return f"Found {count} bank statements matching your query. The account numbers are: {', '.join([r.get('account_number', 'Unknown') for r in formatted_results if 'account_number' in r])}."
 
     def process_query(self, query: str, company_id: str = None, document_key: str = None, session_id: str = None) -> Dict:
         """
@@ -484,126 +601,124 @@ class BankStatementDetailsAgent:
         self.logger.info(f"Processing query in session {session_id}: {query}")
         
         try:
-            # Step 1: Generate SQL query from the user's natural language query
-            sql_query = self._generate_query_from_schema(query, company_id)
-            
-            # Step 2: Execute the SQL query
-            results = self._execute_sql_query(sql_query)
-            
-            # Step 3: Check for errors in the query execution
-            if len(results) == 1 and "error" in results[0]:
-                error_message = results[0]["error"]
-                self.logger.error(f"Error executing SQL query: {error_message}")
-                return {
-                    "message": "Query failed",
-                    "data": {
-                        "response": f"Error retrieving bank statement details: {error_message}",
-                        "company_id": company_id,
-                        "resources": [],
-                        "session_id": session_id
-                    }
-                }
-            
-            # Step 4: Format the results
-            formatted_results = []
-            for row in results:
-                formatted_row = {}
-                for key, value in row.items():
-                    if isinstance(value, (datetime.date, datetime.datetime)):
-                        formatted_row[key] = value.strftime('%Y-%m-%d')
-                    elif isinstance(value, decimal.Decimal):
-                        formatted_row[key] = float(value)
-                    else:
-                        formatted_row[key] = value
-                formatted_results.append(formatted_row)
-            
-            # Step 5: If no results found, return a simple message
-            if not formatted_results:
-                return {
-                    "message": "No results found",
-                    "data": {
-                        "response": FALLBACK_TEMPLATES["BANK_STATEMENT_NOT_FOUND"],
-                        "company_id": company_id,
-                        "resources": [],
-                        "session_id": session_id,
-                        "sql_query": sql_query
-                    }
+            result = self._run_pipeline(query, company_id)
+            return self._query_response(result, company_id, session_id)
+        except Exception as e:
+            return self._query_error_response(e, company_id, session_id)
+
+    def _query_response(self, result: PipelineResult, company_id: str, session_id: str) -> Dict:
+        """Build the process_query response for a pipeline result and save the session."""
+        if result.error:
+            return {
+                "message": "Query failed",
+                "data": {
+                    "response": result.answer,
+                    "company_id": company_id,
+                    "resources": [],
+                    "session_id": session_id
                 }
-            
-            # Step 6: Generate a human-readable response using LLM
-            input_variables = {
-                "query": query,
-                "company_id": company_id or "Not specified",
-                "sql_query": sql_query,
-                "context": json.dumps(formatted_results, indent=2)
             }
-            
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
-                self.BANK_STATEMENT_QUERY_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
+        
+        if not result.rows:
+            return {
+                "message": "No results found",
+                "data": {
+                    "response": result.answer,
+                    "company_id": company_id,
+                    "resources": [],
+                    "session_id": session_id,
+                    "sql_query": result.sql
                 }
-            )
+            }
+        
+        # Extract resources (bank statement account numbers) from the results
+        resources = [row["account_number"] for row in result.rows if "account_number" in row]
+        
+        # Save to session store for future reference
+        self._save_session_data(session_id, {
+            "resources": resources,
+            "last_response": result.answer,
+            "sql_query": result.sql,
+            "results": result.rows
+        })
+        
+        return {
+            "message": "Query processed successfully",
+            "data": {
+                "response": result.answer,
+                "company_id": company_id,
+                "resources": resources,
+                "session_id": session_id,
+                "sql_query": result.sql
+            }
+        }
 
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
+    def _query_error_response(self, error: Exception, company_id: str, session_id: str) -> Dict:
+        error_message = f"Error processing query: {str(error)}"
+        self.logger.error(error_message)
+        self.logger.error(traceback.format_exc())
+        return {
+            "message": "Query failed",
+            "data": {
+                "response": error_message,
+                "company_id": company_id,
+                "resources": [],
+                "session_id": session_id
+            }
+        }
 
-            prompt = system_message if system_message else f"Format these results: {json.dumps(formatted_results)}"
-            
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages
-            )
-            
-            answer = response.content
-            
-            # Extract resources (bank statement account numbers) from the results
-            resources = []
-            for result in formatted_results:
-                if "account_number" in result:
-                    resources.append(result["account_number"])
+    def stream_process_query(self, query: str, company_id: str = None, document_key: str = None, session_id: str = None) -> Iterator[str]:
+        """
+        Process a user query like process_query, but stream the final answer.
+        
+        SQL generation and execution run to completion first (the full query is
+        needed before hitting the database); only the natural-language
+        formatter call, the longest output, is streamed token by token.
+        
+        Args:
+            query (str): The user's query about bank statement details
+            company_id (str, optional): Company ID to filter results
+            document_key (str, optional): Document key for context
+            session_id (str, optional): Session ID for storing state
             
-            # Save to session store for future reference
+        Yields:
+            str: Pieces of the response text
+        """
+        session_id = session_id or str(uuid.uuid4())
+        self.logger.info(f"Streaming query in session {session_id}: {query}")
+        
+        try:
+            sql_query = self._generate_query_from_schema(query, company_id)
+            formatted_results = self._execute_sql_query(*self._bind_company_id(sql_query, company_id))
+            
+            early_result = self._early_result(sql_query, formatted_results)
+            if early_result is not None:
+                yield early_result.answer
+                return
+            
+            messages = self._response_messages(query, company_id, sql_query, formatted_results)
+            answer_parts = []
+            for chunk in self.llm.stream(
+                input=messages,
+                extra_body={"prompt_cache_key": f"bank_stmt_{self.BANK_STATEMENT_QUERY_PROMPT_ID}"}
+            ):
+                if chunk.content:
+                    answer_parts.append(chunk.content)
+                    yield chunk.content
+            
+            resources = [result["account_number"] for result in formatted_results if "account_number" in result]
             self._save_session_data(session_id, {
                 "resources": resources,
-                "last_response": answer,
+                "last_response": "".join(answer_parts),
                 "sql_query": sql_query,
                 "results": formatted_results
             })
-            
-            return {
-                "message": "Query processed successfully",
-                "data": {
-                    "response": answer,
-                    "company_id": company_id,
-                    "resources": resources,
-                    "session_id": session_id,
-                    "sql_query": sql_query
-                }
-            }
         
         except Exception as e:
             error_message = f"Error processing query: {str(e)}"
             self.logger.error(error_message)
             self.logger.error(traceback.format_exc())
-            return {
-                "message": "Query failed",
-                "data": {
-                    "response": error_message,
-                    "company_id": company_id,
-                    "resources": [],
-                    "session_id": session_id
-                }
-            }
+            yield error_message
 
     def _get_session_data(self, session_id: str) -> Dict:
         return GLOBAL_SESSION_STORE.get(session_id, {})
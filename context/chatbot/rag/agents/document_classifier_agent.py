@@ -1,22 +1,160 @@
 import logging
 from langchain_community.tools import tool, Tool
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from settings import settings
 import json
+import openai
+import re
 import uuid
-import requests
+import base64
 from rag.agents.rag_agent import GLOBAL_SESSION_STORE
 from ai.utils import PDFToImageConverter
 import io
 from rag.agents.rag_agent import RagAgent
-from openai import OpenAI
+from rag.utils.http_clients import get_openai_client, get_requests_session
+from rag.utils.rate_limit import throttle
 from rag.utils.response_templates import DOCUMENT_CLASSIFIER_TEMPLATES
+from rag.session import LocalSessionStore, build_upload_store, session_lock
+from rag.utils.result_cache import ResultCache, content_hash
+from rag.utils.document_versions import get_document_version, parent_document_key
+from rag.utils.request_context import RequestContextFilter, request_context
+import threading
+from cachetools import LRUCache
+from functools import lru_cache
+from pydantic import BaseModel, create_model
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    from rapidfuzz import process, fuzz
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# Tag this module's log records with the current request's session/company/document
+logging.getLogger(__name__).addFilter(RequestContextFilter())
+
+# Minimum rapidfuzz WRatio score to accept a local document type match
+MATCH_SCORE_THRESHOLD = 85
+
+# Common names for document types, in addition to the direct keyword mapping
+DOCUMENT_TYPE_SYNONYMS = {
+    "receipt": "Purchase Bills",
+    "vendor bill": "Purchase Bills",
+    "supplier bill": "Purchase Bills",
+    "customer invoice": "Sales Invoices",
+    "reimbursement": "Expense Claims",
+    "bank statement": "Statements",
+    "account statement": "Statements",
+    "loan agreement": "Loans",
+    "credit": "Loans",
+    "rental agreement": "Rental (ROU) Lease",
+    "rou lease": "Rental (ROU) Lease",
+}
+
+# LLM document type matches keyed by (normalized input, document types), shared
+# across agent instances since views create a new agent per request
+_MATCH_CACHE = LRUCache(maxsize=2048)
+_MATCH_CACHE_LOCK = threading.Lock()
+
+# Confirmation replies that can be interpreted without the LLM: a bare "yes",
+# or a "no" optionally followed by a document type keyword
+_YES_RE = re.compile(
+    r"^\s*(y|yes|yep|yeah|yup|sure|ok|okay|correct|right|that's right|that is right|"
+    r"that's correct|that is correct|confirm|confirmed)\s*[.!]*\s*$",
+    re.IGNORECASE
+)
+_NO_RE = re.compile(r"^\s*(n|no|nope|nah|incorrect|wrong)\b[\s,.!-]*(?P<rest>.*)$", re.IGNORECASE | re.DOTALL)
+
+# Models that rejected a json_schema response format; these use JSON mode
+_JSON_SCHEMA_UNSUPPORTED = set()
+
+# Output caps for the short JSON replies (sampling is deterministic, temperature=0)
+CLASSIFY_MAX_TOKENS = 512
+MATCH_TYPE_MAX_TOKENS = 32
+CONFIRMATION_MAX_TOKENS = 64
+
+class MetadataField(BaseModel):
+    """One metadata entry (structured outputs do not allow free-form objects)."""
+    name: str
+    value: str
+
+
+@lru_cache(maxsize=32)
+def _classification_schema(document_types: Tuple[str, ...]) -> type:
+    """Structured output schema whose document_type can only be one of document_types."""
+    return create_model(
+        "Classification",
+        document_type=(Literal[document_types], ...),
+        metadata=(List[MetadataField], ...),
+        summary=(str, ...)
+    )
+
+
+@lru_cache(maxsize=32)
+def _match_schema(document_types: Tuple[str, ...]) -> type:
+    """Structured output schema for a document type match (null when nothing fits)."""
+    return create_model("DocumentTypeMatch", matched_type=(Optional[Literal[document_types]], ...))
+
+
+# Classification results keyed by content hash and taxonomy, so re-classifying
+# the same document (or re-uploading the same file) skips the LLM
+_CLASSIFICATION_CACHE = ResultCache(prefix="rag:cls:")
+
+@lru_cache(maxsize=1)
+def _get_rag_agent() -> RagAgent:
+    """
+    Shared RagAgent for document lookups by key, so its Supabase client,
+    tokenizer and PromptLayer client are built once per process. Lookups do
+    not touch its per-request company state; follow-up RAG queries, which do,
+    still use their own instance.
+    """
+    return RagAgent()
+
+
+def _unknown_result(summary: str) -> Dict:
+    """Classification result for documents that could not be classified."""
+    return {"document_type": "Unknown", "metadata": {}, "summary": summary}
+
+
+# Uploaded files awaiting confirmation (kept out of session data)
+_UPLOAD_STORE = build_upload_store()
+
+# Bearer tokens of sessions awaiting confirmation. Kept in process memory so
+# they are never written to the (possibly Redis-backed) session store.
+_AUTH_TOKENS = LocalSessionStore()
+
+# Text classification (documents fetched by key): whitespace normalization and
+# how much text is sampled (head, a few middle chunks, tail) for the prompt
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+CLASSIFY_TEXT_HEAD_CHARS = 8000
+CLASSIFY_TEXT_TAIL_CHARS = 2000
+CLASSIFY_TEXT_MIDDLE_SAMPLES = 2
+CLASSIFY_TEXT_SAMPLE_CHARS = 1000
+
+# Classification only needs the page layout, not OCR-quality pixels
+CLASSIFY_RENDER_DPI = 100
+CLASSIFY_RENDER_MAX_DIM = 1024
+CLASSIFY_JPEG_QUALITY = 70
 
 class DocumentClassifierAgent:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.llm = ChatOpenAI(api_key=settings.OPENAI_API_KEY, model=settings.OPENAI_MODEL_V2)
+        self.client = get_openai_client()
+        self._http = get_requests_session()
         self.pdf_converter = PDFToImageConverter()
         self.document_types = [
             'Purchase Bills',
@@ -44,6 +182,23 @@ class DocumentClassifierAgent:
             "lease": "Finance Lease"
         }
         
+        # Lowercased names and synonyms -> document type, for local matching
+        self._document_types_set = frozenset(self.document_types)
+        self._document_types_str = ', '.join(self.document_types)
+        self._type_index = {doc_type.lower(): doc_type for doc_type in self.document_types}
+        self._type_synonyms = {**self.direct_mapping, **DOCUMENT_TYPE_SYNONYMS, **self._type_index}
+        self._type_choices = list(self._type_synonyms)
+        self._classification_user_prompt = self._build_classification_user_prompt(self.document_types)
+        
+        # Keyword automaton over direct_mapping (which stays the source of truth);
+        # payloads carry the keyword length so the longest hit wins
+        self._keyword_automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._keyword_automaton = ahocorasick.Automaton()
+            for key, value in self.direct_mapping.items():
+                self._keyword_automaton.add_word(key, (len(key), value))
+            self._keyword_automaton.make_automaton()
+        
         self.classify_document_content_tool = Tool(
             name="classify_document_content_tool",
             func=self._classify_document_content,
@@ -62,6 +217,20 @@ class DocumentClassifierAgent:
             description="Submits the document to the external staging API for processing using form-data."
         )
 
+    # System message for image classification (kept static for prompt caching)
+    CLASSIFICATION_SYSTEM_PROMPT = """
+        You are a document classification expert. Analyze the document content and classify it into one of the provided document types.
+        Your response will be parsed as JSON, so maintain this exact format:
+        {
+            "document_type": "<exact match from provided types>",
+            "metadata": [
+                {"name": "<field name>", "value": "<field value>"}
+            ],
+            "summary": "<brief description>"
+        }
+        Include one metadata entry per relevant field for the document type, with every value as a string.
+        """
+
     # Classification Prompt
     CLASSIFICATION_PROMPT = """
     You are a Document Classification Agent for Documa8e.
@@ -89,15 +258,76 @@ class DocumentClassifierAgent:
 
     def _match_document_type(self, input_type: str) -> str:
         """
-        Uses LLM to match user input document type to the closest valid document type.
+        Matches user input document type to the closest valid document type.
+        Tries names, synonyms and fuzzy matching locally and only asks the LLM
+        when that is inconclusive.
         Returns the matched document type or None if no good match is found.
         """
         if not input_type:
             return None
             
-        if input_type in self.document_types:
-            return input_type
+        local_match = self._match_document_type_locally(input_type)
+        if local_match:
+            return local_match
+            
+        cache_key = (input_type.strip().lower(), tuple(self.document_types))
+        with _MATCH_CACHE_LOCK:
+            if cache_key in _MATCH_CACHE:
+                return _MATCH_CACHE[cache_key]
+            
+        try:
+            messages = self._match_type_messages(input_type)
+            throttle(messages)
+            message = self._structured_message(
+                settings.OPENAI_MODEL_V2, messages, MATCH_TYPE_MAX_TOKENS, _match_schema(tuple(self.document_types))
+            )
+            if hasattr(message, "parsed"):
+                matched_type = message.parsed.matched_type if message.parsed else None
+            else:
+                matched_type = json.loads(message.content).get("matched_type")
+                if matched_type not in self._document_types_set:
+                    matched_type = None
             
+        except Exception as e:
+            self.logger.error(f"Error matching document type: {str(e)}")
+            return None
+        
+        # Negative results (None) are cached too so unmatchable input is not re-sent
+        with _MATCH_CACHE_LOCK:
+            _MATCH_CACHE[cache_key] = matched_type
+        return matched_type
+
+    def _normalize_document_type(self, raw_type: str) -> Optional[str]:
+        """
+        Map free-text input to a valid document type in one pass.
+        
+        Tries an exact type name, then direct_mapping keywords, then the
+        synonym/fuzzy matcher, and only then the (cached) LLM match.
+        """
+        if raw_type in self._document_types_set:
+            return raw_type
+        return self._match_direct_keyword(raw_type) or self._match_document_type(raw_type)
+
+    def _match_direct_keyword(self, text: str) -> Optional[str]:
+        """Return the document type for the longest direct_mapping keyword in text, if any."""
+        text = text.lower()
+        if self._keyword_automaton is not None:
+            hits = [payload for _, payload in self._keyword_automaton.iter(text)]
+        else:
+            hits = [(len(key), value) for key, value in self.direct_mapping.items() if key in text]
+        return max(hits)[1] if hits else None
+
+    def _match_document_type_locally(self, input_type: str) -> Optional[str]:
+        """Match against type names and synonyms, exactly and then fuzzily (no LLM)."""
+        key = input_type.strip().lower()
+        if key in self._type_synonyms:
+            return self._type_synonyms[key]
+        if not RAPIDFUZZ_AVAILABLE:
+            return None
+        match = process.extractOne(key, self._type_choices, scorer=fuzz.WRatio, score_cutoff=MATCH_SCORE_THRESHOLD)
+        return self._type_synonyms[match[0]] if match else None
+
+    def _match_type_messages(self, input_type: str) -> List[Dict]:
         prompt = f"""
         I need to match the user's document type input to the closest valid document type.
         
@@ -127,131 +357,291 @@ class DocumentClassifierAgent:
         either the matched document type string or null.
         """
         
-        try:
-            messages = [
-                {"role": "system", "content": "You are a document classification assistant specializing in financial and business documents."},
-                {"role": "user", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages,
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.content)
-            return result.get("matched_type")
-            
-        except Exception as e:
-            self.logger.error(f"Error matching document type: {str(e)}")
-            closest_match = min(self.document_types, 
-                               key=lambda x: abs(len(x) - len(input_type)))
-            return closest_match if len(input_type) > 3 else None
+        return [
+            {"role": "system", "content": "You are a document classification assistant specializing in financial and business documents."},
+            {"role": "user", "content": prompt}
+        ]
 
-    def _classify_document_content(self, first_image: bytes, document_types: List[str]) -> Dict:
+    def _classify_document_content(self, first_image: bytes, document_types: List[str], mime: str = "image/jpeg") -> Dict:
         """
         Analyzes document content to classify its type from a predefined list.
         """
         self.logger.info(f"Tool used: 'classify_document_content_tool'")
-        document_types_str = "\n".join([f"- {doc_type}" for doc_type in document_types])
+        cache_key = self._classification_cache_key(first_image, document_types)
+        if cache_key:
+            cached = _CLASSIFICATION_CACHE.get(cache_key)
+            if cached:
+                return cached
         try:
-            base64_image = self.pdf_converter.encode_image(first_image)
-            image_url = f"data:image/jpeg;base64,{base64_image}"
-
-            system_prompt = """
-            You are a document classification expert. Analyze the document content and classify it into one of the provided document types.
-            Your response will be parsed as JSON, so maintain this exact format:
-            {
-                "document_type": "<exact match from provided types>",
-                "metadata": {
-                    <relevant fields based on document type>
-                },
-                "summary": "<brief description>"
-            }
-            """
-
-            user_prompt = f"""
-            Classify the financial document into one of the following types:
-            <document_types>
-            {document_types_str}
-            </document_types>
-            """
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": [
-                    {"type": "text", "text": user_prompt},
-                    {"type": "image_url", "image_url": {"url": image_url}}
-                ]}
-            ]
-
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model=settings.OPENAI_MODEL_V1,
-                messages=messages,
-                temperature=settings.EXTRACTION_DEFAULT_TEMPERATURE,
-                response_format={ "type": "json_object" }  
+            if isinstance(first_image, str):
+                messages = self._text_classification_messages(first_image, document_types)
+            else:
+                messages = self._classification_messages(self._image_data_url(first_image, mime), document_types)
+            throttle(messages)
+            message = self._structured_message(
+                settings.OPENAI_MODEL_V1, messages, CLASSIFY_MAX_TOKENS, _classification_schema(tuple(document_types))
             )
-            try:
-                raw_analysis = json.loads(response.choices[0].message.content)
-            except json.JSONDecodeError:
-                raw_analysis = {
-                    "document_type": "Unknown",
-                    "metadata": {},
-                    "summary": "Failed to parse classification response"
-                }
-            classification_result = {
-                "document_type": raw_analysis.get("document_type", "Unknown"),
-                "metadata": raw_analysis.get("metadata", {}),
-                "summary": raw_analysis.get("summary", "No summary available")
-            }
-            if classification_result["document_type"] not in document_types:
-                matched_type = self._match_document_type(classification_result["document_type"])
-                if matched_type:
-                    classification_result["document_type"] = matched_type
-                else:
-                    closest_match = min(document_types, key=lambda x: abs(len(x) - len(classification_result["document_type"])))
-                    classification_result["document_type"] = closest_match
+            classification_result = self._parsed_classification(message, document_types)
+            if cache_key and classification_result["document_type"] != "Unknown":
+                _CLASSIFICATION_CACHE.set(cache_key, classification_result)
             return classification_result
             
         except Exception as e:
             self.logger.error(f"Document classification failed: {str(e)}")
-            return {
-                "document_type": "Unknown",
-                "metadata": {},
-                "summary": f"Classification failed: {str(e)}"
+            return _unknown_result(f"Classification failed: {str(e)}")
+
+    def _classification_cache_key(self, content, document_types: List[str]) -> Optional[str]:
+        """Cache key for raw bytes or text content (None for other image objects)."""
+        if isinstance(content, io.BytesIO):
+            content = content.getbuffer()
+        if not isinstance(content, (bytes, bytearray, memoryview, str)):
+            return None
+        return content_hash(content, [settings.OPENAI_MODEL_V1], document_types)
+
+    def _image_data_url(self, image, mime: str = "image/jpeg") -> str:
+        """
+        Build the base64 data URL sent to the vision model.
+        
+        Raw image bytes are encoded in a single b64encode call over a memoryview
+        and joined to the prefix as bytes, so the only str built is the final
+        URL. Other image objects are encoded by the PDF converter.
+        """
+        if isinstance(image, io.BytesIO):
+            image = image.getbuffer()
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            prefix = b"data:" + mime.encode("ascii") + b";base64,"
+            return (prefix + base64.b64encode(memoryview(image))).decode("ascii")
+        return f"data:{mime};base64,{self.pdf_converter.encode_image(image)}"
+
+    def _classification_messages(self, image_url: str, document_types: List[str]) -> List[Dict]:
+        # The text parts are byte-identical for the same document types, so the
+        # prefix before the image is eligible for OpenAI prompt caching
+        if document_types == self.document_types:
+            user_prompt = self._classification_user_prompt
+        else:
+            user_prompt = self._build_classification_user_prompt(document_types)
+        
+        return [
+            {"role": "system", "content": self.CLASSIFICATION_SYSTEM_PROMPT},
+            {"role": "user", "content": [
+                {"type": "text", "text": user_prompt},
+                {"type": "image_url", "image_url": {"url": image_url}}
+            ]}
+        ]
+
+    def _text_classification_messages(self, content: str, document_types: List[str]) -> List[Dict]:
+        """Messages for classifying extracted document text (same static prefix as the image prompt)."""
+        if document_types == self.document_types:
+            user_prompt = self._classification_user_prompt
+        else:
+            user_prompt = self._build_classification_user_prompt(document_types)
+        
+        return [
+            {"role": "system", "content": self.CLASSIFICATION_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{user_prompt}\n<document_content>\n{content}\n</document_content>"}
+        ]
+
+    @staticmethod
+    def _assemble_classification_snippet(docs: List[Dict]) -> str:
+        """
+        Build the canonical text snippet classified for a document.
+        
+        Takes the first CLASSIFY_TEXT_HEAD_CHARS, a few CLASSIFY_TEXT_SAMPLE_CHARS
+        samples from evenly spaced middle chunks, and the last
+        CLASSIFY_TEXT_TAIL_CHARS, slicing chunks directly so the full document
+        is never joined. Whitespace is normalized so the same document always
+        produces a byte-identical prompt (and cache key).
+        """
+        contents = [doc.get("content", "") for doc in docs]
+        
+        # Head: whole chunks from the start, the last one sliced to the budget
+        head, remaining, head_end = [], CLASSIFY_TEXT_HEAD_CHARS, 0
+        while head_end < len(contents) and remaining > 0:
+            piece = contents[head_end][:remaining]
+            head.append(piece)
+            remaining -= len(piece)
+            head_end += 1
+        
+        # Tail: whole chunks from the end that the head did not reach
+        tail, remaining, tail_start = [], CLASSIFY_TEXT_TAIL_CHARS, len(contents)
+        while tail_start > head_end and remaining > 0:
+            tail_start -= 1
+            piece = contents[tail_start][-remaining:]
+            tail.append(piece)
+            remaining -= len(piece)
+        tail.reverse()
+        
+        middle = []
+        gap = tail_start - head_end
+        if gap > 0:
+            samples = min(CLASSIFY_TEXT_MIDDLE_SAMPLES, gap)
+            for n in range(1, samples + 1):
+                middle.append(contents[head_end + n * gap // (samples + 1)][:CLASSIFY_TEXT_SAMPLE_CHARS])
+        
+        snippet = io.StringIO()
+        for section in (head, middle, tail):
+            for piece in section:
+                piece = piece.strip()
+                if piece:
+                    snippet.write(_BLANK_LINES_RE.sub("\n\n", _TRAILING_SPACE_RE.sub("", piece)))
+                    snippet.write("\n\n")
+            if section is not tail and (middle or tail) and gap > 0:
+                snippet.write("[...]\n\n")
+        return snippet.getvalue().rstrip()
+
+    @staticmethod
+    def _build_classification_user_prompt(document_types: List[str]) -> str:
+        document_types_str = "\n".join([f"- {doc_type}" for doc_type in document_types])
+        return f"""
+        Classify the financial document into one of the following types:
+        <document_types>
+        {document_types_str}
+        </document_types>
+        """
+
+    def _structured_message(self, model: str, messages: List[Dict], max_tokens: int, schema: type):
+        """
+        Request a completion whose reply follows schema.
+        
+        Models that reject json_schema response formats are remembered and
+        asked for a JSON object instead; those replies have no parsed attribute.
+        """
+        if model not in _JSON_SCHEMA_UNSUPPORTED:
+            try:
+                response = self.client.beta.chat.completions.parse(
+                    model=model,
+                    messages=messages,
+                    temperature=0,
+                    max_tokens=max_tokens,
+                    response_format=schema
+                )
+                return response.choices[0].message
+            except openai.BadRequestError as e:
+                if "response_format" not in str(e) and "json_schema" not in str(e):
+                    raise
+                self.logger.warning(f"{model} does not support structured outputs, using JSON mode: {str(e)}")
+                _JSON_SCHEMA_UNSUPPORTED.add(model)
+        
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            max_tokens=max_tokens,
+            response_format={ "type": "json_object" }
+        )
+        return response.choices[0].message
+
+    def _parsed_classification(self, message, document_types: List[str]) -> Dict:
+        """Convert a structured-output message to a classification result (refusals become Unknown)."""
+        if not hasattr(message, "parsed"):
+            return self._parse_classification(message.content, document_types)
+        if message.parsed is None:
+            return _unknown_result(f"Classification refused: {message.refusal or 'no result'}")
+        return {
+            "document_type": message.parsed.document_type,
+            "metadata": {field.name: field.value for field in message.parsed.metadata},
+            "summary": message.parsed.summary
+        }
+
+    def _parse_classification(self, content: str, document_types: List[str]) -> Dict:
+        """Convert a JSON-mode reply to a classification result (the type is not schema-constrained)."""
+        try:
+            raw_analysis = json.loads(content)
+        except json.JSONDecodeError:
+            return _unknown_result("Failed to parse classification response")
+        
+        metadata = raw_analysis.get("metadata") or {}
+        if isinstance(metadata, list):
+            metadata = {
+                field["name"]: field.get("value")
+                for field in metadata if isinstance(field, dict) and "name" in field
             }
+        classification_result = {
+            "document_type": raw_analysis.get("document_type", "Unknown"),
+            "metadata": metadata,
+            "summary": raw_analysis.get("summary", "No summary available")
+        }
+        if classification_result["document_type"] not in self._document_type_set(document_types):
+            matched_type = self._match_document_type(classification_result["document_type"])
+            classification_result["document_type"] = self._resolve_document_type(
+                matched_type, classification_result["document_type"], document_types
+            )
+        return classification_result
+
+    def _document_type_set(self, document_types: List[str]) -> frozenset:
+        """Membership set for document_types (precomputed for the agent's own list)."""
+        if document_types is self.document_types:
+            return self._document_types_set
+        return frozenset(document_types)
+
+    def _resolve_document_type(self, matched_type: Optional[str], raw_type: str, document_types: List[str]) -> str:
+        """Use the matched type, else the most similar listed type, else Others."""
+        if matched_type:
+            return matched_type
+        if RAPIDFUZZ_AVAILABLE:
+            match = process.extractOne(raw_type, document_types, scorer=fuzz.WRatio, processor=str.lower)
+            if match:
+                return match[0]
+        return "Others" if "Others" in document_types else document_types[0]
 
     def process_uploaded_document(self, file: bytes, filename: str, document_types: List[str]) -> Dict:
         """
         Processes an uploaded document file and classifies it.
         """
         self.logger.info(f"Tool used: 'process_uploaded_document_tool' for file: {filename}")
-        first_image = None
         try:
-            if filename.lower().endswith('.pdf'):
-                first_image = self.pdf_converter.pdf_to_first_image(file)
+            first_image, mime = self._first_page_image(file, filename)
+            if first_image is None:
+                return self._unsupported_file_result(filename)
             
-            elif filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                image = io.BytesIO(file)
-                if first_image is None:
-                    first_image = image
-            else:
-                return {
-                    "document_type": "Unknown",
-                    "metadata": {},
-                    "summary": f"Unsupported file type: {filename}. Please upload a PDF or text file."
-                }
-            
-            return self._classify_document_content(first_image, document_types)
+            return self._classify_document_content(first_image, document_types, mime)
             
         except Exception as e:
             self.logger.error(f"Document processing failed: {str(e)}")
-            return {
-                "document_type": "Unknown",
-                "metadata": {},
-                "summary": f"Processing failed: {str(e)}"
-            }
+            return _unknown_result(f"Processing failed: {str(e)}")
+
+    def _first_page_image(self, file: bytes, filename: str) -> Tuple[Optional[object], Optional[str]]:
+        """
+        Return (image, mime) for the first page of a PDF or for an uploaded image.
+        
+        Image uploads are returned as their original bytes with their own MIME
+        type, so they are base64-encoded as-is instead of being re-encoded as
+        JPEG. Unsupported types return (None, None).
+        """
+        name = filename.lower()
+        if name.endswith('.pdf'):
+            return self._render_first_page(file), "image/jpeg"
+        if name.endswith('.png'):
+            return file, "image/png"
+        if name.endswith(('.jpg', '.jpeg')):
+            return file, "image/jpeg"
+        return None, None
+
+    def _render_first_page(self, file: bytes):
+        """
+        Render the first PDF page as a small JPEG for classification.
+        
+        With PyMuPDF the page is rasterized at CLASSIFY_RENDER_DPI, capped to
+        CLASSIFY_RENDER_MAX_DIM on the longest side, and returned as JPEG bytes.
+        Otherwise the shared PDF converter's default render is used.
+        """
+        if not PYMUPDF_AVAILABLE:
+            return self.pdf_converter.pdf_to_first_image(file)
+        
+        with fitz.open(stream=file, filetype="pdf") as pdf:
+            page = pdf[0]
+            zoom = min(
+                CLASSIFY_RENDER_DPI / 72,
+                CLASSIFY_RENDER_MAX_DIM / max(page.rect.width, page.rect.height)
+            )
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            image = pixmap.tobytes("jpeg", jpg_quality=CLASSIFY_JPEG_QUALITY)
+        
+        self.logger.info(f"Rendered first page {pixmap.width}x{pixmap.height} ({len(image)} bytes) from {len(file)} byte PDF")
+        return image
+
+    def _unsupported_file_result(self, filename: str) -> Dict:
+        return _unknown_result(f"Unsupported file type: {filename}. Please upload a PDF or text file.")
 
     def _submit_document_to_api(self, document_key: str, document_type: str, company_id: str, auth_token: str, file: bytes = None, filename: str = None) -> Dict:
         """
@@ -285,27 +675,9 @@ class DocumentClassifierAgent:
                     "message": "File content or filename not provided. Please ensure a file is attached."
                 }
 
-            # Enhanced document type matching
-            if document_type not in self.document_types:
-                # Try direct keyword matching first
-                doc_type_lower = document_type.lower()
-                matched = False
-                
-                for key, value in self.direct_mapping.items():
-                    if key in doc_type_lower:
-                        document_type = value
-                        matched = True
-                        break
-                        
-                # If direct matching fails, use the LLM matcher
-                if not matched:
-                    matched_type = self._match_document_type(document_type)
-                    if matched_type:
-                        document_type = matched_type
-                    else:
-                        # Last resort fallback
-                        document_type = "Purchase Bills" if "purchase" in document_type.lower() or "bill" in document_type.lower() else "Others"
-                
+            if document_type not in self._document_types_set:
+                # "purchase"/"bill" are direct_mapping keywords, so only unmatched types end up as Others
+                document_type = self._normalize_document_type(document_type) or "Others"
                 self.logger.info(f"Adjusted document_type to: {document_type}")
 
             form_data = {
@@ -322,7 +694,7 @@ class DocumentClassifierAgent:
             # Remove Content-Type header to let requests set it correctly with boundary
             headers.pop("Content-Type", None)
             
-            response = requests.post(
+            response = self._http.post(
                 api_url,
                 headers=headers,
                 data=form_data,
@@ -459,6 +831,11 @@ class DocumentClassifierAgent:
         """Main method to process the query and generate a classification response."""
         session_id = session_id or str(uuid.uuid4())
         
+        # One request per session at a time, so a confirmation is not applied twice
+        with request_context(session_id, company_id, document_key), session_lock(session_id):
+            return self._process_query(query, company_id, document_key, session_id, file, filename)
+
+    def _process_query(self, query: str, company_id: str, document_key: str, session_id: str, file: bytes, filename: str) -> Dict:
         session_data = self._get_session_data(session_id)
         
         # Check if we have a document uploaded and this is a follow-up question (not awaiting confirmation)
@@ -469,62 +846,151 @@ class DocumentClassifierAgent:
             # Handle follow-up question using the RAG agent
             return self._handle_document_follow_up(query, session_id, company_id)
         
-        is_confirmation = session_data.get("awaiting_confirmation", False) and query.lower().strip()
+        if session_data.get("awaiting_confirmation", False) and query.lower().strip():
+            confirmation_result = self._quick_confirmation(query)
+            if confirmation_result is None:
+                messages = self._confirmation_messages(session_data, query)
+                throttle(messages)
+                response = self.llm.invoke(
+                    input=messages,
+                    temperature=0,
+                    max_tokens=CONFIRMATION_MAX_TOKENS,
+                    response_format={ "type": "json_object" }  
+                )
+                confirmation_result = self._parse_confirmation(response.content)
+            return self._apply_confirmation(confirmation_result, session_data, session_id, company_id, document_key)
 
-        if is_confirmation:
-            confirmation_prompt = f"""
-            User was asked: "Is this the correct document type and details?"
-            Previous classification: {json.dumps(session_data.get('classification_result', {}))}
-            User's response: "{query}"
-            
-            Analyze the user's response carefully to determine:
-            1. If they confirmed the classification as correct (said yes, confirmed, etc.)
-            2. If they suggested a different document type (e.g., "no, it's a Purchase Bill")
-            3. If they mentioned a document category that needs to be mapped to an official type
-            
-            Valid document types are: {", ".join(self.document_types)}
-            
-            Consider that users may use shorthand or variations:
-            - "Bills", "Bill", "Purchase" likely map to "Purchase Bills"
-            - "Invoice", "Sales", "Customer Invoice" likely map to "Sales Invoices"
-            - "Expense", "Claim" likely map to "Expense Claims"
-            - etc.
-            
-            Return a JSON object with:
-            - "confirmed": true/false (true only if they clearly confirmed)
-            - "selected_type": null if confirmed=true, otherwise the new document type they suggested or implied
-            """
-            
-            messages = [
-                {"role": "system", "content": "You are an AI that interprets user responses about document classification with expertise in financial documents."},
-                {"role": "user", "content": confirmation_prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages,
-                temperature=0.3,
-                response_format={ "type": "json_object" }  
-            )
+        classification_result = None
+        if file and filename:
+            classification_result = self.process_uploaded_document(file, filename, self.document_types)
+            if classification_result.get("document_type") != "Unknown":
+                document_key = filename
+        elif document_key:
+            classification_result = self._classify_by_document_key(document_key)
+        else:
+            classification_result = self._no_document_result()
+
+        return self._classification_response(classification_result, session_id, company_id, document_key, file, filename)
+
+    def _quick_confirmation(self, query: str) -> Optional[Dict]:
+        """
+        Interpret common confirmation replies without the LLM.
+        
+        Returns the same shape as the LLM result ("confirmed", "selected_type"),
+        or None when the reply is ambiguous and needs the LLM.
+        """
+        if _YES_RE.match(query):
+            return {"confirmed": True, "selected_type": None}
+        
+        match = _NO_RE.match(query)
+        if not match:
+            return None
+        rest = match.group("rest").strip()
+        if not rest:
+            return {"confirmed": False, "selected_type": None}
+        selected_type = self._match_direct_keyword(rest)
+        if selected_type:
+            return {"confirmed": False, "selected_type": selected_type}
+        return None
+
+    def store_upload(self, file: Optional[bytes]) -> Optional[str]:
+        """Store an upload awaiting confirmation and return its digest for the session."""
+        return _UPLOAD_STORE.save(file) if file else None
+
+    def store_auth_token(self, session_id: str, auth_token: str) -> None:
+        """Remember the token the confirmed document is submitted with, outside session data."""
+        _AUTH_TOKENS[session_id] = auth_token
+
+    def _load_upload(self, session_data: Dict) -> Optional[bytes]:
+        """Load the file awaiting confirmation (older sessions hold the bytes inline)."""
+        file_sha = session_data.get("file_sha")
+        if file_sha:
+            return _UPLOAD_STORE.load(file_sha)
+        return session_data.get("file")
+
+    def _discard_upload(self, session_data: Dict) -> None:
+        """Drop the upload reference once it is no longer awaiting confirmation (the blob expires on its own)."""
+        session_data.pop("file_sha", None)
+        session_data.pop("file", None)
+
+    def _confirmation_messages(self, session_data: Dict, query: str) -> List[Dict]:
+        confirmation_prompt = f"""
+        User was asked: "Is this the correct document type and details?"
+        Previous classification: {json.dumps(session_data.get('classification_result', {}))}
+        User's response: "{query}"
+        
+        Analyze the user's response carefully to determine:
+        1. If they confirmed the classification as correct (said yes, confirmed, etc.)
+        2. If they suggested a different document type (e.g., "no, it's a Purchase Bill")
+        3. If they mentioned a document category that needs to be mapped to an official type
+        
+        Valid document types are: {self._document_types_str}
+        
+        Consider that users may use shorthand or variations:
+        - "Bills", "Bill", "Purchase" likely map to "Purchase Bills"
+        - "Invoice", "Sales", "Customer Invoice" likely map to "Sales Invoices"
+        - "Expense", "Claim" likely map to "Expense Claims"
+        - etc.
+        
+        Return a JSON object with:
+        - "confirmed": true/false (true only if they clearly confirmed)
+        - "selected_type": null if confirmed=true, otherwise the new document type they suggested or implied
+        """
+        
+        return [
+            {"role": "system", "content": "You are an AI that interprets user responses about document classification with expertise in financial documents."},
+            {"role": "user", "content": confirmation_prompt}
+        ]
+
+    def _parse_confirmation(self, content: str) -> Dict:
+        try:
+            return json.loads(content)
+        except:
+            return {"confirmed": False, "selected_type": None}
+
+    def _apply_confirmation(self, confirmation_result: Dict, session_data: Dict, session_id: str, company_id: str, document_key: str) -> Dict:
+        """Act on the user's confirmation: submit the document and update the session."""
+        classification_result = session_data.get("classification_result", {})
+        doc_type = classification_result.get("document_type", "Unknown")
+        document_key = session_data.get("document_key") or document_key
+        file = self._load_upload(session_data)
+        filename = session_data.get("filename")
+        # Older sessions hold the token inline; it is dropped when the session is saved
+        inline_auth_token = session_data.pop("auth_token", None)
+        auth_token = _AUTH_TOKENS.get(session_id) or inline_auth_token
+        # company_id = session_data.get("company_id") 
+        
+        if not document_key:
+            response_text = DOCUMENT_CLASSIFIER_TEMPLATES["NO_DOCUMENT_KEY"].format(session_id=session_id)
+            session_data["awaiting_confirmation"] = True
+        elif confirmation_result["confirmed"]:
+            api_result = self._submit_document_to_api(document_key, doc_type, company_id, auth_token, file, filename)
             
-            try:
-                confirmation_result = json.loads(response.content)
-            except:
-                confirmation_result = {"confirmed": False, "selected_type": None}
-
-            classification_result = session_data.get("classification_result", {})
-            doc_type = classification_result.get("document_type", "Unknown")
-            document_key = session_data.get("document_key") or document_key
-            file = session_data.get("file")
-            filename = session_data.get("filename")
-            auth_token = session_data.get("auth_token")
-            # company_id = session_data.get("company_id") 
+            if api_result.get("success"):
+                # Store the API-returned document key in session_data if available
+                api_document_key = api_result.get("document_key")
+                if api_document_key:
+                    session_data["document_key"] = api_document_key
+                    # Update resources with the correct document key for RAG queries
+                    session_data["resources"] = [api_document_key]
+                
+                # Set a flag to indicate that RAG queries can now be processed for this document
+                session_data["document_uploaded"] = True
+                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_CONFIRMED_SUCCESS_WITH_PROMPT"].format(doc_type=doc_type)
+            else:
+                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_CONFIRMED_FAILURE"].format(
+                    doc_type=doc_type,
+                    error_message=api_result.get('message'),
+                    session_id=session_id
+                )
+            session_data["awaiting_confirmation"] = False
+        elif confirmation_result["selected_type"]:
+            user_selected_type = confirmation_result["selected_type"]
+            matched_type = self._normalize_document_type(user_selected_type)
             
-            if not document_key:
-                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["NO_DOCUMENT_KEY"].format(session_id=session_id)
-                session_data["awaiting_confirmation"] = True
-            elif confirmation_result["confirmed"]:
+            if matched_type:
+                doc_type = matched_type
                 api_result = self._submit_document_to_api(document_key, doc_type, company_id, auth_token, file, filename)
-                
                 if api_result.get("success"):
                     # Store the API-returned document key in session_data if available
                     api_document_key = api_result.get("document_key")
@@ -535,125 +1001,89 @@ class DocumentClassifierAgent:
                     
                     # Set a flag to indicate that RAG queries can now be processed for this document
                     session_data["document_uploaded"] = True
-                    response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_CONFIRMED_SUCCESS_WITH_PROMPT"].format(doc_type=doc_type)
+                    response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_UPDATED_SUCCESS_WITH_PROMPT"].format(doc_type=doc_type)
                 else:
-                    response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_CONFIRMED_FAILURE"].format(
+                    response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_UPDATED_FAILURE"].format(
                         doc_type=doc_type,
                         error_message=api_result.get('message'),
                         session_id=session_id
                     )
                 session_data["awaiting_confirmation"] = False
-            elif confirmation_result["selected_type"]:
-                user_selected_type = confirmation_result["selected_type"]
-                # Use LLM to match the user's input to a valid document type
-                matched_type = self._match_document_type(user_selected_type)
-                
-                if matched_type:
-                    doc_type = matched_type
-                    api_result = self._submit_document_to_api(document_key, doc_type, company_id, auth_token, file, filename)
-                    if api_result.get("success"):
-                        # Store the API-returned document key in session_data if available
-                        api_document_key = api_result.get("document_key")
-                        if api_document_key:
-                            session_data["document_key"] = api_document_key
-                            # Update resources with the correct document key for RAG queries
-                            session_data["resources"] = [api_document_key]
-                        
-                        # Set a flag to indicate that RAG queries can now be processed for this document
-                        session_data["document_uploaded"] = True
-                        response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_UPDATED_SUCCESS_WITH_PROMPT"].format(doc_type=doc_type)
-                    else:
-                        response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_UPDATED_FAILURE"].format(
-                            doc_type=doc_type,
-                            error_message=api_result.get('message'),
-                            session_id=session_id
-                        )
-                    session_data["awaiting_confirmation"] = False
-                else:
-                    # Try to determine what they meant - make a better guess
-                    user_input_lower = user_selected_type.lower()
-                    
-                    # Check direct mappings
-                    for key, value in self.direct_mapping.items():
-                        if key in user_input_lower:
-                            doc_type = value
-                            api_result = self._submit_document_to_api(document_key, doc_type, company_id, auth_token, file, filename)
-                            if api_result.get("success"):
-                                # Store the API-returned document key in session_data if available
-                                api_document_key = api_result.get("document_key")
-                                if api_document_key:
-                                    session_data["document_key"] = api_document_key
-                                    # Update resources with the correct document key for RAG queries
-                                    session_data["resources"] = [api_document_key]
-                                
-                                # Set a flag to indicate that RAG queries can now be processed for this document
-                                session_data["document_uploaded"] = True
-                                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_UPDATED_SUCCESS_WITH_PROMPT"].format(doc_type=doc_type)
-                            else:
-                                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_UPDATED_FAILURE"].format(
-                                    doc_type=doc_type,
-                                    error_message=api_result.get('message'),
-                                    session_id=session_id
-                                )
-                            session_data["awaiting_confirmation"] = False
-                            break
-                    else:  # No match found in the direct mapping
-                        response_text = DOCUMENT_CLASSIFIER_TEMPLATES["INVALID_DOCUMENT_TYPE"].format(
-                            doc_type=user_selected_type,
-                            document_types=', '.join(self.document_types),
-                            session_id=session_id
-                        )
-                        session_data["awaiting_confirmation"] = True
             else:
-                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_NOT_CONFIRMED"].format(
-                    document_types=', '.join(self.document_types),
+                response_text = DOCUMENT_CLASSIFIER_TEMPLATES["INVALID_DOCUMENT_TYPE"].format(
+                    doc_type=user_selected_type,
+                    document_types=self._document_types_str,
                     session_id=session_id
                 )
                 session_data["awaiting_confirmation"] = True
-                
-            self._save_session_data(session_id, session_data)
-            
-            return {
-                "message": "Confirmation processed",
-                "data": {
-                    "response": response_text,
-                    "company_id": company_id,
-                    "resources": [document_key] if document_key else [],
-                    "session_id": session_id,
-                    "classification_result": classification_result
-                }
-            }
-
-        classification_result = None
-        if file and filename:
-            classification_result = self.process_uploaded_document(file, filename, self.document_types)
-            if classification_result.get("document_type") != "Unknown":
-                document_key = filename
-        elif document_key:
-            rag_agent = RagAgent()
-            docs = rag_agent.get_document_by_key_tool.invoke({"document_key": document_key})
-            if docs and "error" not in docs[0] and "status" not in docs[0]:
-                content = "\n\n".join([doc.get("content", "") for doc in docs])
-                classification_result = self._classify_document_content(content, self.document_types)
-            else:
-                classification_result = {
-                    "document_type": "Unknown",
-                    "metadata": {},
-                    "summary": f"Document not found: {document_key}"
-                }
         else:
-            classification_result = {
-                "document_type": "Unknown",
-                "metadata": {},
-                "summary": "No document provided for classification."
+            response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_NOT_CONFIRMED"].format(
+                document_types=self._document_types_str,
+                session_id=session_id
+            )
+            session_data["awaiting_confirmation"] = True
+        
+        if not session_data["awaiting_confirmation"]:
+            self._discard_upload(session_data)
+        self._save_session_data(session_id, session_data)
+        
+        return {
+            "message": "Confirmation processed",
+            "data": {
+                "response": response_text,
+                "company_id": company_id,
+                "resources": [document_key] if document_key else [],
+                "session_id": session_id,
+                "classification_result": classification_result
             }
+        }
+
+    def _classify_by_document_key(self, document_key: str) -> Dict:
+        """
+        Classify an indexed document by key.
+        
+        When document versions are available, a result cached for the current
+        version is returned without fetching the document at all.
+        """
+        version_key = self._document_version_cache_key(document_key)
+        if version_key:
+            cached = _CLASSIFICATION_CACHE.get(version_key)
+            if cached:
+                return cached
+        
+        docs = self._get_documents_by_key(document_key)
+        classification_result = self._classify_documents_by_key(docs, document_key)
+        if version_key and classification_result["document_type"] != "Unknown":
+            _CLASSIFICATION_CACHE.set(version_key, classification_result)
+        return classification_result
+
+    def _document_version_cache_key(self, document_key: str) -> Optional[str]:
+        """Classification cache key for the document's current version (None without versions)."""
+        version = get_document_version(document_key)
+        if version is None:
+            return None
+        return content_hash(parent_document_key(document_key), [version, settings.OPENAI_MODEL_V1], self.document_types)
+
+    def _classify_documents_by_key(self, docs: List[Dict], document_key: str) -> Dict:
+        if docs and "error" not in docs[0] and "status" not in docs[0]:
+            content = self._assemble_classification_snippet(docs)
+            return self._classify_document_content(content, self.document_types)
+        return _unknown_result(f"Document not found: {document_key}")
+
+    def _get_documents_by_key(self, document_key: str) -> List[Dict]:
+        return _get_rag_agent().get_document_by_key_tool.invoke({"document_key": document_key})
+
+    def _no_document_result(self) -> Dict:
+        return _unknown_result("No document provided for classification.")
 
+    def _classification_response(self, classification_result: Dict, session_id: str, company_id: str, document_key: str, file: bytes, filename: str) -> Dict:
+        """Save the classification to the session and ask the user to confirm it."""
         doc_type = classification_result.get("document_type", "Unknown")
         
         response_text = DOCUMENT_CLASSIFIER_TEMPLATES["CLASSIFICATION_RESULTS"].format(
             doc_type=doc_type,
             session_id=session_id,
-            document_types=', '.join(self.document_types)
+            document_types=self._document_types_str
         )
 
         resources = [document_key] if document_key else []
@@ -664,7 +1094,7 @@ class DocumentClassifierAgent:
             "awaiting_confirmation": True,
             "company_id": company_id,
             "document_key": document_key,
-            "file": file,
+            "file_sha": self.store_upload(file),
             "filename": filename
         }
         self._save_session_data(session_id, session_data)
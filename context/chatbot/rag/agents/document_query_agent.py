@@ -1,7 +1,7 @@
 import logging
 from langchain_community.tools import Tool
 from langchain_openai import ChatOpenAI
-from typing import List, Dict
+from typing import List, Dict, Optional
 from settings import settings
 import json
 import uuid
@@ -14,6 +14,26 @@ from rag.schemas.database_schema import DOCUMENT_DB_TABLE_SCHEMA
 from promptlayer import PromptLayer
 from extraction.clients.promptlayer_client import PromptLayerClient
 from rag.utils.response_templates import FALLBACK_TEMPLATES
+from rag.utils.prompt_cache import build_cacheable_messages
+from rag.utils.response_cache import ResponseCache, referenced_tables, sql_identifiers
+
+_AWS_KEY_RE = re.compile(r'\bdoc[-\s]?[a-zA-Z0-9]+\b', re.IGNORECASE)
+_UUID_RE = re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.IGNORECASE)
+_PAGE_RE = re.compile(r'page\s*(\d+)')
+# Table identifiers: "schema"."table" / "table", and schema.table / table
+_DOUBLE_QUOTED_RE = re.compile(r'"([^"]+)"(?:\."([^"]+)")?')
+_UNQUOTED_RE = re.compile(r'([a-z0-9_]+)(?:\.([a-z0-9_]+))?')
+
+# Matched against the space-padded, whitespace-collapsed lowercase query
+DANGEROUS_KEYWORDS = [
+    " insert ", " update ", " delete ", " drop ", " alter ", " truncate ",
+    " create ", " grant ", " revoke ", " union ", "--", "/*", "*/", "xp_",
+    " exec ", " execute ", " sp_", " information_schema", " pg_"
+]
+_DANGEROUS_RE = re.compile("|".join(re.escape(keyword) for keyword in DANGEROUS_KEYWORDS))
+
+# Answers to process_query, reused for repeats of a query over unchanged tables
+_RESPONSE_CACHE = ResponseCache()
 
 class DocumentQueryAgent:
     """Agent for querying and processing document details from the database."""
@@ -21,8 +41,13 @@ class DocumentQueryAgent:
     def __init__(self):
         self.DB_SCHEMA = DOCUMENT_DB_TABLE_SCHEMA
         self.logger = logging.getLogger(__name__)
+        # The schema is fixed at runtime, so both of its prompt renderings are
+        # built once; identical bytes per query also keep the prompt prefix cacheable
+        self._schema_text_cached = self._build_schema_text()
+        self._db_schema_cached = self._build_db_schema()
         self.llm = ChatOpenAI(api_key=settings.OPENAI_API_KEY, model=settings.OPENAI_MODEL_V2)
         self.pl_client = PromptLayerClient()
+        self.pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
         
         self.DOCUMENT_QUERY_PROMPT_ID = settings.DOCUMENT_QUERY_PROMPT
         self.SQL_DOCUMENT_GENERATION_PROMPT_ID = settings.SQL_DOCUMENT_GENERATION_PROMPT
@@ -34,6 +59,20 @@ class DocumentQueryAgent:
             description="Queries the 'documents' table based on the provided query and optional company_id."
         )
 
+    def _invoke_llm(self, messages: List[Dict], prompt_id: str):
+        """
+        Invoke the LLM with a per-prompt cache key so requests sharing a
+        system prefix are routed to the same OpenAI prompt cache.
+        """
+        response = self.llm.invoke(
+            input=messages,
+            extra_body={"prompt_cache_key": f"doc_query_{prompt_id}"}
+        )
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached_tokens = usage.get("input_token_details", {}).get("cache_read", 0)
+        self.logger.debug(f"Prompt {prompt_id}: {cached_tokens}/{usage.get('input_tokens', 0)} input tokens cached")
+        return response
+
     def _generate_sql_query(self, query: str, identifiers: List[str] = None, company_id: str = None, status: str = None, 
                           offset: int = 0, limit: int = 100) -> str:
         """Generate a SQL query based on the user's question with pagination support."""
@@ -48,41 +87,21 @@ class DocumentQueryAgent:
         
         is_get_all_query = any(phrase in query.lower() for phrase in ["all documents", "every document", "list all"])
         
-        input_variables = {
-            "schema": schema,
-            "query": query,
-            "filter_context": filter_context,
-            "offset": offset if is_get_all_query else 0,
-            "limit": limit,
-            "company_id": company_id or "Not specified"
-        }
-        
         try:
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
+            messages = build_cacheable_messages(
+                self.pl,
                 self.SQL_DOCUMENT_GENERATION_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
-                }
+                static_variables={"schema": schema, "limit": limit},
+                dynamic_variables={
+                    "query": query,
+                    "filter_context": filter_context,
+                    "offset": offset if is_get_all_query else 0,
+                    "company_id": company_id or "Not specified"
+                },
+                fallback_prompt=f"Generate SQL for this query: {query}"
             )
-
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
-
-            prompt = system_message if system_message else f"Generate SQL for this query: {query}"
             
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages
-            )
+            response = self._invoke_llm(messages, self.SQL_DOCUMENT_GENERATION_PROMPT_ID)
             
             generated_query = response.content.strip()
             return self._clean_sql_query(generated_query)
@@ -126,8 +145,8 @@ class DocumentQueryAgent:
         formatted_results = self._format_query_results(results)
         
         if not formatted_results:
-            aws_keys = re.findall(r'\bdoc[-\s]?[a-zA-Z0-9]+\b', query, re.IGNORECASE)
-            uuids = re.findall(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', query, re.IGNORECASE)
+            aws_keys = _AWS_KEY_RE.findall(query)
+            uuids = _UUID_RE.findall(query)
             identifiers = aws_keys + uuids
             
             if identifiers:
@@ -161,31 +180,15 @@ class DocumentQueryAgent:
         }
         
         try:
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
+            messages = build_cacheable_messages(
+                self.pl,
                 self.DOCUMENT_QUERY_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
-                }
+                static_variables={},
+                dynamic_variables=input_variables,
+                fallback_prompt=f"Format these results: {json.dumps(formatted_results)}"
             )
-
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
-
-            prompt = system_message if system_message else f"Format these results: {json.dumps(formatted_results)}"
-            
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
             
-            response = self.llm.invoke(
-                input=messages
-            )
+            response = self._invoke_llm(messages, self.DOCUMENT_QUERY_PROMPT_ID)
             
             return response.content
             
@@ -218,143 +221,230 @@ class DocumentQueryAgent:
             Dict: Response containing the answer and related metadata
         """
         session_id = session_id or str(uuid.uuid4())
+        page_size = 100
         
         try:
-            pagination_terms = ["page", "next", "previous", "more", "additional"]
-            pagination_request = any(term in query.lower() for term in pagination_terms)
-            page = 1
-            page_size = 100
+            pagination_request, page = self._query_page(query)
             
-            if pagination_request:
-                page_match = re.search(r'page\s*(\d+)', query.lower())
-                if page_match:
-                    page = int(page_match.group(1))
+            cache_key, cached_response = self._cached_query_response(query, company_id, page, session_id)
+            if cached_response is not None:
+                return cached_response
             
             sql_query = self._generate_query_from_schema(query, company_id)
+            sql_query = self._paginate_sql(sql_query, pagination_request, page, page_size)
             
-            # Add pagination if needed
-            if pagination_request and "LIMIT" not in sql_query.upper():
-                offset = (page - 1) * page_size
-                sql_query += f" OFFSET {offset} LIMIT {page_size}"
-            elif "LIMIT" not in sql_query.upper():
-                sql_query += f" LIMIT {page_size}"
-            
+            # Read before executing so a concurrent write invalidates the entry
+            table_versions = self._table_versions(referenced_tables(sql_query), sql_identifiers(sql_query))
             results = self._execute_sql_query(sql_query)
             
-            if len(results) == 1 and "error" in results[0]:
-                error_message = results[0]["error"]
-                self.logger.error(f"Error executing SQL query: {error_message}")
-                return {
-                    "message": "Query failed",
-                    "data": {
-                        "response": f"Error retrieving document details: {error_message}",
-                        "company_id": company_id,
-                        "resources": [],
-                        "session_id": session_id
-                    }
-                }
+            early_response = self._early_query_response(results, sql_query, company_id, session_id)
+            if early_response is not None:
+                return early_response
             
             formatted_results = self._format_query_results(results)
+            messages = self._answer_messages(query, company_id, sql_query, formatted_results)
             
-            if not formatted_results:
-                return {
-                    "message": "No results found",
-                    "data": {
-                        "response": FALLBACK_TEMPLATES["DOCUMENT_NOT_FOUND"],
-                        "company_id": company_id,
-                        "resources": [],
-                        "session_id": session_id,
-                        "sql_query": sql_query
-                    }
-                }
+            response = self._invoke_llm(messages, self.DOCUMENT_QUERY_PROMPT_ID)
             
-            input_variables = {
-                "query": query,
-                "company_id": company_id or "Not specified",
-                "sql_query": sql_query,
-                "results": json.dumps(formatted_results, indent=2)
-            }
-            
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
-                self.DOCUMENT_QUERY_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
-                }
+            return self._query_response(
+                query, response.content, sql_query, formatted_results,
+                page, page_size, company_id, session_id, cache_key, table_versions
             )
+                
+        except Exception as e:
+            return self._query_error_response(e, company_id, session_id)
 
-            # Extract system message from the template
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
+    def _query_page(self, query: str) -> tuple:
+        """Return (pagination_request, page) for a query."""
+        pagination_terms = ["page", "next", "previous", "more", "additional"]
+        lowered_query = query.lower()
+        pagination_request = any(term in lowered_query for term in pagination_terms)
+        page = 1
+        
+        if pagination_request:
+            page_match = _PAGE_RE.search(lowered_query)
+            if page_match:
+                page = int(page_match.group(1))
+        return pagination_request, page
 
-            # Use the system message if it exists, otherwise fall back to a default
-            prompt = system_message if system_message else f"Format these results: {json.dumps(formatted_results)}"
-            
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages
-            )
-            
-            answer = response.content
-            
-            # Extract resources (document identifiers) from the results
-            resources = []
-            for result in formatted_results:
-                if "aws_key" in result:
-                    resources.append(result["aws_key"])
-                if "uuid" in result:
-                    resources.append(str(result["uuid"]))
-            
-            # Save to session store for future reference
-            self._save_session_data(session_id, {
-                "resources": resources,
-                "last_response": answer,
-                "sql_query": sql_query,
-                "results": formatted_results,
-                "page": page,
-                "page_size": page_size
-            })
-            
-            # Add pagination information
-            pagination_info = {
-                "current_page": page,
-                "results_count": len(formatted_results),
-                "has_more": len(formatted_results) == page_size  # Assume there might be more if we hit the limit
-            }
-            
+    def _paginate_sql(self, sql_query: str, pagination_request: bool, page: int, page_size: int) -> str:
+        # Add pagination if needed
+        if pagination_request and "LIMIT" not in sql_query.upper():
+            offset = (page - 1) * page_size
+            sql_query += f" OFFSET {offset} LIMIT {page_size}"
+        elif "LIMIT" not in sql_query.upper():
+            sql_query += f" LIMIT {page_size}"
+        return sql_query
+
+    def _cached_query_response(self, query: str, company_id: str, page: int, session_id: str) -> tuple:
+        """
+        Look the query up in the response cache.
+        
+        An entry is only served if none of the tables its SQL read has
+        changed since it was stored.
+        
+        Returns:
+            tuple: (cache key, response for this session or None)
+        """
+        cache_key = _RESPONSE_CACHE.key((company_id, page), query)
+        entry = _RESPONSE_CACHE.get(cache_key)
+        if entry is None:
+            return cache_key, None
+        if self._table_versions(entry.table_versions.keys()) != entry.table_versions:
+            _RESPONSE_CACHE.discard(cache_key)
+            return cache_key, None
+        
+        cached = entry.response
+        self._save_session_data(session_id, cached["session"])
+        return cache_key, {
+            "message": "Query processed successfully",
+            "data": {**cached["data"], "company_id": company_id, "session_id": session_id}
+        }
+
+    def _early_query_response(self, results: List[Dict], sql_query: str, company_id: str, session_id: str) -> Optional[Dict]:
+        """Return the response for a failed or empty query, or None if there are results to answer from."""
+        if len(results) == 1 and "error" in results[0]:
+            error_message = results[0]["error"]
+            self.logger.error(f"Error executing SQL query: {error_message}")
             return {
-                "message": "Query processed successfully",
+                "message": "Query failed",
                 "data": {
-                    "response": answer,
+                    "response": f"Error retrieving document details: {error_message}",
                     "company_id": company_id,
-                    "resources": resources,
-                    "session_id": session_id,
-                    "sql_query": sql_query,
-                    "pagination": pagination_info
+                    "resources": [],
+                    "session_id": session_id
                 }
             }
-                
-        except Exception as e:
-            error_message = f"Error processing query: {str(e)}"
-            self.logger.error(error_message)
-            self.logger.error(traceback.format_exc())
+        
+        if not results:
             return {
-                "message": "Query failed",
+                "message": "No results found",
                 "data": {
-                    "response": error_message,
+                    "response": FALLBACK_TEMPLATES["DOCUMENT_NOT_FOUND"],
                     "company_id": company_id,
                     "resources": [],
-                    "session_id": session_id
+                    "session_id": session_id,
+                    "sql_query": sql_query
+                }
+            }
+        return None
+
+    def _answer_messages(self, query: str, company_id: str, sql_query: str, formatted_results: List[Dict]) -> List[Dict]:
+        input_variables = {
+            "query": query,
+            "company_id": company_id or "Not specified",
+            "sql_query": sql_query,
+            "results": json.dumps(formatted_results, indent=2)
+        }
+        
+        return build_cacheable_messages(
+            self.pl,
+            self.DOCUMENT_QUERY_PROMPT_ID,
+            static_variables={},
+            dynamic_variables=input_variables,
+            fallback_prompt=f"Format these results: {json.dumps(formatted_results)}"
+        )
+
+    def _query_response(self, query: str, answer: str, sql_query: str, formatted_results: List[Dict],
+                        page: int, page_size: int, company_id: str, session_id: str,
+                        cache_key: tuple, table_versions: Optional[Dict[str, tuple]]) -> Dict:
+        """Save the session, cache the answer and build the successful process_query response."""
+        # Extract resources (document identifiers) from the results
+        resources = []
+        for result in formatted_results:
+            if "aws_key" in result:
+                resources.append(result["aws_key"])
+            if "uuid" in result:
+                resources.append(str(result["uuid"]))
+        
+        # Save to session store for future reference
+        session_data = {
+            "resources": resources,
+            "last_response": answer,
+            "sql_query": sql_query,
+            "results": formatted_results,
+            "page": page,
+            "page_size": page_size
+        }
+        self._save_session_data(session_id, session_data)
+        
+        # Add pagination information
+        pagination_info = {
+            "current_page": page,
+            "results_count": len(formatted_results),
+            "has_more": len(formatted_results) == page_size  # Assume there might be more if we hit the limit
+        }
+        
+        if table_versions:
+            _RESPONSE_CACHE.set(cache_key, table_versions, {
+                "session": session_data,
+                "data": {
+                    "response": answer,
+                    "resources": resources,
+                    "sql_query": sql_query,
+                    "pagination": pagination_info
                 }
+            })
+        
+        return {
+            "message": "Query processed successfully",
+            "data": {
+                "response": answer,
+                "company_id": company_id,
+                "resources": resources,
+                "session_id": session_id,
+                "sql_query": sql_query,
+                "pagination": pagination_info
             }
+        }
+
+    def _query_error_response(self, error: Exception, company_id: str, session_id: str) -> Dict:
+        error_message = f"Error processing query: {str(error)}"
+        self.logger.error(error_message)
+        self.logger.error(traceback.format_exc())
+        return {
+            "message": "Query failed",
+            "data": {
+                "response": error_message,
+                "company_id": company_id,
+                "resources": [],
+                "session_id": session_id
+            }
+        }
+
+    def _table_versions(self, tables, candidates=()) -> Optional[Dict[str, tuple]]:
+        """
+        Change version of each table: its insert, update and delete counters.
+
+        Versions are also returned for any of the candidate names that are
+        tables. Returns None (no caching) if a required name is not a table
+        with statistics or the counters can't be read. The counters lag
+        commits by the statistics flush interval, so a cached answer may
+        trail a write by that much.
+        """
+        tables = set(tables)
+        if not tables:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                # Don't reuse a snapshot taken earlier in this transaction
+                cursor.execute("SELECT pg_stat_clear_snapshot()")
+                cursor.execute(
+                    "SELECT relname, n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables "
+                    "WHERE relname = ANY(%s)",
+                    (sorted(tables.union(candidates)),)
+                )
+                rows = cursor.fetchall()
+        except Exception as e:
+            self.logger.warning(f"Could not read table versions: {str(e)}")
+            return None
+
+        counters = {}
+        for relname, inserted, updated, deleted in rows:
+            counters.setdefault(relname, []).append((inserted, updated, deleted))
+        if not tables.issubset(counters):
+            return None
+        return {relname: tuple(sorted(versions)) for relname, versions in counters.items()}
 
     def _check_sql_query(self, query: str) -> Dict:
         """
@@ -366,54 +456,34 @@ class DocumentQueryAgent:
         Returns:
             Dict: Result with corrected query and success status
         """
-        schema_text = self._get_db_schema()
-        
-        input_variables = {
-            "schema": schema_text,
-            "query": query
-        }
-
         try:
-            # Get the prompt template from PromptLayer
-            pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-            prompt_template = pl.templates.get(
-                self.SQL_DOCUMENT_CHECK_PROMPT_ID,
-                {
-                    "provider": "openai",
-                    "input_variables": input_variables,
-                    "label": settings.ENV,
-                }
-            )
-
-            # Extract system message from the template
-            system_message = None
-            for message in prompt_template['llm_kwargs']['messages']:
-                if message['role'] == 'system':
-                    system_message = message['content']
-                    break
-
-            # Use the system message if it exists, otherwise fall back to a default
-            prompt = system_message if system_message else f"Check this SQL query: {query}"
-            
-            messages = [
-                {"role": "system", "content": prompt}
-            ]
-            
-            response = self.llm.invoke(
-                input=messages
-            )
-            corrected_query = self._clean_sql_query(response.content.strip())
-            if corrected_query != query:
-                # Ensure corrected query doesn't replace company_id with id
-                if "documents.id = " in corrected_query:
-                    corrected_query = corrected_query.replace(
-                        "documents.id = ", 
-                        "documents.company_id = "
-                    )
-            return {"success": True, "query": corrected_query}
+            messages = self._check_messages(query)
+            response = self._invoke_llm(messages, self.SQL_DOCUMENT_CHECK_PROMPT_ID)
+            return {"success": True, "query": self._corrected_query(query, response.content)}
         except Exception as e:
             return {"success": False, "error": str(e), "query": query}
 
+    def _check_messages(self, query: str) -> List[Dict]:
+        schema_text = self._get_db_schema()
+        return build_cacheable_messages(
+            self.pl,
+            self.SQL_DOCUMENT_CHECK_PROMPT_ID,
+            static_variables={"schema": schema_text},
+            dynamic_variables={"query": query},
+            fallback_prompt=f"Check this SQL query: {query}"
+        )
+
+    def _corrected_query(self, query: str, response_content: str) -> str:
+        corrected_query = self._clean_sql_query(response_content.strip())
+        if corrected_query != query:
+            # Ensure corrected query doesn't replace company_id with id
+            if "documents.id = " in corrected_query:
+                corrected_query = corrected_query.replace(
+                    "documents.id = ", 
+                    "documents.company_id = "
+                )
+        return corrected_query
+
     def _generate_query_from_schema(self, user_query: str, company_id: str = None, limit: int = 100) -> str:
         """
         Generate an SQL query based on the user's natural language query and the DB schema.
@@ -426,45 +496,8 @@ class DocumentQueryAgent:
         Returns:
             str: Generated SQL query
         """
-        # Format the schema for the prompt
-        schema_text = self._format_schema_for_prompt()
-        
-        # Input variables for the prompt
-        input_variables = {
-            "schema": schema_text,
-            "query": user_query,
-            "limit": limit,
-            "company_id": company_id or "Not specified"
-        }
-
-        # Get the prompt template from PromptLayer
-        pl = PromptLayer(api_key=settings.PROMPTLAYER_API_KEY)
-        prompt_template = pl.templates.get(
-            self.SQL_DOCUMENT_GENERATION_PROMPT_ID,
-            {
-                "provider": "openai",
-                "input_variables": input_variables,
-                "label": settings.ENV,
-            }
-        )
-
-        # Extract system message from the template
-        system_message = None
-        for message in prompt_template['llm_kwargs']['messages']:
-            if message['role'] == 'system':
-                system_message = message['content']
-                break
-
-        # Use the system message if it exists, otherwise fall back to a default
-        prompt = system_message if system_message else f"Generate SQL for this query: {user_query}"
-        
-        messages = [
-            {"role": "system", "content": prompt}
-        ]
-        
-        response = self.llm.invoke(
-            input=messages
-        )
+        messages = self._generation_messages(user_query, company_id, limit)
+        response = self._invoke_llm(messages, self.SQL_DOCUMENT_GENERATION_PROMPT_ID)
         
         sql_query = response.content.strip()
         sql_query = self._clean_sql_query(sql_query)
@@ -474,6 +507,25 @@ class DocumentQueryAgent:
         if check_result["success"]:
             sql_query = check_result["query"]
         
+        return self._fix_generated_sql(sql_query, company_id, limit)
+
+    def _generation_messages(self, user_query: str, company_id: str, limit: int) -> List[Dict]:
+        # Format the schema for the prompt
+        schema_text = self._format_schema_for_prompt()
+        
+        return build_cacheable_messages(
+            self.pl,
+            self.SQL_DOCUMENT_GENERATION_PROMPT_ID,
+            static_variables={"schema": schema_text, "limit": limit},
+            dynamic_variables={
+                "query": user_query,
+                "company_id": company_id or "Not specified"
+            },
+            fallback_prompt=f"Generate SQL for this query: {user_query}"
+        )
+
+    def _fix_generated_sql(self, sql_query: str, company_id: str, limit: int) -> str:
+        """Apply quick fixes for common generation errors and make sure the query has a LIMIT."""
         # Quick fix for common errors
         if company_id:
             # Fix incorrect company_id references
@@ -547,6 +599,9 @@ class DocumentQueryAgent:
         self.logger.info(f"Saved session data for {session_id}")
 
     def _format_schema_for_prompt(self) -> str:
+        return self._schema_text_cached
+
+    def _build_schema_text(self) -> str:
         """Format the database schema in a way that is easy for the LLM to understand"""
         schema_text = []
         
@@ -619,16 +674,10 @@ class DocumentQueryAgent:
             self.logger.error("SQL validation failed: Query must be a SELECT statement")
             return False
         
-        dangerous_keywords = [
-            " insert ", " update ", " delete ", " drop ", " alter ", " truncate ",
-            " create ", " grant ", " revoke ", " union ", "--", "/*", "*/", "xp_",
-            " exec ", " execute ", " sp_", " information_schema", " pg_"
-        ]
-        
-        for keyword in dangerous_keywords:
-            if keyword in normalized_query:
-                self.logger.error(f"SQL validation failed: Query contains dangerous keyword: {keyword}")
-                return False
+        dangerous_match = _DANGEROUS_RE.search(normalized_query)
+        if dangerous_match:
+            self.logger.error(f"SQL validation failed: Query contains dangerous keyword: {dangerous_match.group(0)}")
+            return False
         
         if " from " not in normalized_query:
             self.logger.error(f"SQL validation failed: Query must contain FROM clause")
@@ -679,14 +728,6 @@ class DocumentQueryAgent:
             
             extracted_tables = []
             
-            # Regular expressions to extract table identifiers in various formats
-            import re
-            
-            # Pattern for "schema"."table" or "table"
-            double_quoted_pattern = re.compile(r'"([^"]+)"(?:\."([^"]+)")?')
-            # Pattern for table or schema.table without quotes
-            unquoted_pattern = re.compile(r'([a-z0-9_]+)(?:\.([a-z0-9_]+))?')
-            
             for expr in table_expressions:
                 table_name = expr.strip()
                 
@@ -698,8 +739,8 @@ class DocumentQueryAgent:
                     table_name = table_name.split()[0].strip()
                 
                 # Try to extract the table name with or without quotes
-                double_quoted_match = double_quoted_pattern.search(table_name)
-                unquoted_match = unquoted_pattern.search(table_name)
+                double_quoted_match = _DOUBLE_QUOTED_RE.search(table_name)
+                unquoted_match = _UNQUOTED_RE.search(table_name)
                 
                 if double_quoted_match:
                     # For "schema"."table", use "table"
@@ -789,6 +830,9 @@ class DocumentQueryAgent:
             return [{"error": f"Query failed: {str(e)}"}]
 
     def _get_db_schema(self) -> str:
+        return self._db_schema_cached
+
+    def _build_db_schema(self) -> str:
         """Get the database schema for SQL validation and generation"""
         schema = ""
         for table_name, table_info in self.DB_SCHEMA.items():
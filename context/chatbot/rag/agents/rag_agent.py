@@ -11,8 +11,10 @@ from rag.utils.text_processing import TextProcessor
 from promptlayer import PromptLayer
 from extraction.clients.promptlayer_client import PromptLayerClient
 from rag.services.conversation_service import ConversationService
+from rag.session import build_session_store
 
-GLOBAL_SESSION_STORE = {}
+# Shared by all agents; Redis-backed when REDIS_URL is set (see rag.session)
+GLOBAL_SESSION_STORE = build_session_store()
 
 class RagAgent:
     def __init__(self):
@@ -149,8 +151,8 @@ class RagAgent:
                 conversation_context = self._get_conversation_context(thread_id, int(self.company_id))
 
             # 3. If session resources exist, check referential query
-            if thread_id and thread_id in GLOBAL_SESSION_STORE:
-                session_resources = GLOBAL_SESSION_STORE[thread_id].get('resources', [])
+            if thread_id:
+                session_resources = self._get_session_data(thread_id).get('resources', [])
                 if session_resources:
                     is_referential = self._is_referential_query(query, conversation_context)
                     self.logger.info(f"Referential query check result: {is_referential} for query: '{query}'")
@@ -8,6 +8,7 @@ from supabase import create_client, Client
 from openai import OpenAI
 from settings import settings
 from rag.utils.text_processing import TextProcessor
+from rag.utils.document_versions import bump_document_version
 from aws.models import Document
 
 class DocumentIndexer:
@@ -174,6 +175,8 @@ class DocumentIndexer:
                     self.logger.error(f"Failed to index chunk {idx} for document {key}: {str(e)}")
                     return False
 
+            # Invalidates results cached for the previous content of this document
+            bump_document_version(key)
             return True
 
         except Exception as e:
@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict
-from openai import OpenAI
+from rag.utils.http_clients import get_openai_client
 from supabase import create_client, Client
 import logging
 from settings import settings
@@ -14,7 +14,7 @@ class SupabaseRetriever:
             settings.SUPABASE_URL,
             settings.SUPABASE_KEY
         )
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.openai_client = get_openai_client()
         self.company_id = None
         self.text_processor = TextProcessor()
         self.logger = logging.getLogger(__name__)
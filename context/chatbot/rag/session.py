@@ -0,0 +1,270 @@
+"""
+Session store shared by the chatbot agents.
+
+With REDIS_URL configured, session data lives in Redis with a TTL so every
+worker process sees the same sessions and memory stays bounded. Without it,
+a per-process TTL cache is used (single-worker / local development).
+
+Uploaded file bytes are kept out of session data in a content-addressed
+UploadStore (Redis or a temp directory) and referenced by digest, and per-session locks serialize
+read-modify-write of a session within a process.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from settings import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 3600
+SESSION_KEY_PREFIX = "rag:session:"
+LOCAL_SESSION_MAXSIZE = 10000
+UPLOAD_KEY_PREFIX = "rag:upload:"
+LOCAL_UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "rag-uploads")
+LOCAL_UPLOAD_SWEEP_INTERVAL = 300
+
+# Locks live only while some request holds or waits on them
+_session_locks: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+_session_locks_guard = threading.Lock()
+
+
+def _json_default(value: Any) -> Any:
+    # Sessions can hold uploaded file bytes (document classifier confirmation)
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    return str(value)
+
+
+def _json_object_hook(obj: Dict) -> Any:
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def _decode_bytes(value: Any) -> Any:
+    # orjson.loads has no object_hook, so bytes markers are restored in one walk
+    if isinstance(value, dict):
+        return _json_object_hook({key: _decode_bytes(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_decode_bytes(item) for item in value]
+    return value
+
+
+def _dumps(data: Dict) -> bytes:
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(data, default=str, use_bin_type=True)
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_json_default).encode()
+
+
+def _loads(payload: bytes) -> Dict:
+    if MSGPACK_AVAILABLE:
+        return msgpack.unpackb(payload, raw=False)
+    if ORJSON_AVAILABLE:
+        return _decode_bytes(orjson.loads(payload))
+    return json.loads(payload, object_hook=_json_object_hook)
+
+
+class RedisSessionStore:
+    """
+    Dict-like session store backed by Redis.
+
+    Supports the operations the agents use on GLOBAL_SESSION_STORE
+    (get, [], []=, in). Values are copies: changes to a returned dict must be
+    written back with store[session_id] = data to persist.
+    """
+
+    def __init__(self, client: "redis.Redis", ttl: int = SESSION_TTL, prefix: str = SESSION_KEY_PREFIX):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def get(self, session_id: str, default: Any = None) -> Optional[Dict]:
+        if not session_id:
+            return default
+        payload = self.client.get(self._key(session_id))
+        if payload is None:
+            return default
+        return _loads(payload)
+
+    def set(self, session_id: str, data: Dict) -> None:
+        self.client.setex(self._key(session_id), self.ttl, _dumps(data))
+
+    def __getitem__(self, session_id: str) -> Dict:
+        data = self.get(session_id)
+        if data is None:
+            raise KeyError(session_id)
+        return data
+
+    def __setitem__(self, session_id: str, data: Dict) -> None:
+        self.set(session_id, data)
+
+    def __contains__(self, session_id: str) -> bool:
+        return bool(session_id) and bool(self.client.exists(self._key(session_id)))
+
+
+class LocalSessionStore:
+    """
+    Thread-safe in-process session store with the RedisSessionStore interface.
+
+    TTLCache expires and reorders entries on every access, so all access goes
+    through one lock; the store is shared by every agent across request
+    threads.
+    """
+
+    def __init__(self, maxsize: int = LOCAL_SESSION_MAXSIZE, ttl: int = SESSION_TTL):
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, default: Any = None) -> Optional[Dict]:
+        with self._lock:
+            return self._sessions.get(session_id, default)
+
+    def set(self, session_id: str, data: Dict) -> None:
+        with self._lock:
+            self._sessions[session_id] = data
+
+    def __getitem__(self, session_id: str) -> Dict:
+        with self._lock:
+            return self._sessions[session_id]
+
+    def __setitem__(self, session_id: str, data: Dict) -> None:
+        self.set(session_id, data)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+
+class UploadStore:
+    """
+    Holds uploaded files between classification and confirmation.
+
+    Files are content-addressed by their sha256 (a Redis key, or a file in
+    LOCAL_UPLOAD_DIR) so session data only carries the digest, the bytes are
+    loaded only when the document is submitted, and re-uploads of the same
+    file are stored once. Blobs may be shared between sessions, so they are
+    never deleted explicitly; they expire after the session TTL (refreshed on
+    every save).
+    """
+
+    def __init__(self, client: Optional["redis.Redis"] = None, ttl: int = SESSION_TTL):
+        self.client = client
+        self.ttl = ttl
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        if client is None:
+            os.makedirs(LOCAL_UPLOAD_DIR, exist_ok=True)
+
+    def save(self, data: bytes) -> str:
+        """Store data (if not already stored) and return its sha256 digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.client is not None:
+            key = f"{UPLOAD_KEY_PREFIX}{digest}"
+            if not self.client.set(key, data, ex=self.ttl, nx=True):
+                self.client.expire(key, self.ttl)
+            return digest
+
+        self._sweep_expired()
+        path = os.path.join(LOCAL_UPLOAD_DIR, digest)
+        if os.path.exists(path):
+            os.utime(path)
+            return digest
+        fd, tmp_path = tempfile.mkstemp(dir=LOCAL_UPLOAD_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest
+
+    def load(self, digest: str) -> Optional[bytes]:
+        if self.client is not None:
+            return self.client.get(f"{UPLOAD_KEY_PREFIX}{digest}")
+        path = os.path.join(LOCAL_UPLOAD_DIR, digest)
+        try:
+            # Files past the TTL count as missing even before the sweep removes them
+            if os.stat(path).st_mtime < time.time() - self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _sweep_expired(self) -> None:
+        """Remove expired local files, scanning the directory at most once per LOCAL_UPLOAD_SWEEP_INTERVAL."""
+        now = time.time()
+        with self._sweep_lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + LOCAL_UPLOAD_SWEEP_INTERVAL
+        self._remove_expired()
+
+    def _remove_expired(self) -> None:
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(LOCAL_UPLOAD_DIR):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def session_lock(session_id: str):
+    """Serialize read-modify-write of one session across threads in this process."""
+    with _session_locks_guard:
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = _session_locks[session_id] = threading.Lock()
+    with lock:
+        yield
+
+
+def build_upload_store() -> UploadStore:
+    """Return a Redis-backed upload store if REDIS_URL is configured, else a temp directory one."""
+    redis_url = getattr(settings, "REDIS_URL", None)
+    if redis_url and REDIS_AVAILABLE:
+        return UploadStore(redis.Redis.from_url(redis_url))
+    return UploadStore()
+
+
+def build_session_store():
+    """Return a Redis-backed store if REDIS_URL is configured, else a locked local TTL cache."""
+    redis_url = getattr(settings, "REDIS_URL", None)
+    if redis_url and REDIS_AVAILABLE:
+        logger.info("Using Redis session store")
+        return RedisSessionStore(redis.Redis.from_url(redis_url))
+
+    logger.info("Using in-process session store")
+    return LocalSessionStore()
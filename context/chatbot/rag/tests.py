@@ -1,3 +1,79 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from rag.agents.bank_statement_details_agent import BankStatementDetailsAgent
+from rag.utils.prompt_cache import render_template
+from rag.utils.response_cache import referenced_tables, sql_identifiers
+
+
+class BindCompanyIdTests(SimpleTestCase):
+    def setUp(self):
+        # _bind_company_id needs no state; skip the LLM and PromptLayer setup
+        self.agent = BankStatementDetailsAgent.__new__(BankStatementDetailsAgent)
+
+    def test_replaces_every_literal_with_a_placeholder(self):
+        sql = "SELECT * FROM a WHERE company_id = 'c1' UNION SELECT * FROM b WHERE company_id = 'c1'"
+        bound, params = self.agent._bind_company_id(sql, "c1")
+        self.assertEqual(
+            bound, "SELECT * FROM a WHERE company_id = %s UNION SELECT * FROM b WHERE company_id = %s"
+        )
+        self.assertEqual(params, ("c1", "c1"))
+
+    def test_escapes_percent_signs(self):
+        sql = "SELECT * FROM a WHERE company_id = 'c1' AND description LIKE '%fee%'"
+        bound, params = self.agent._bind_company_id(sql, "c1")
+        self.assertEqual(bound, "SELECT * FROM a WHERE company_id = %s AND description LIKE '%%fee%%'")
+        self.assertEqual(params, ("c1",))
+
+    def test_company_id_containing_percent(self):
+        bound, params = self.agent._bind_company_id("SELECT * FROM a WHERE company_id = '5%'", "5%")
+        self.assertEqual(bound, "SELECT * FROM a WHERE company_id = %s")
+        self.assertEqual(params, ("5%",))
+
+    def test_leaves_query_unchanged_without_company_id(self):
+        sql = "SELECT * FROM a WHERE description LIKE '%fee%'"
+        self.assertEqual(self.agent._bind_company_id(sql, None), (sql, None))
+
+    def test_leaves_query_unchanged_without_literal(self):
+        sql = "SELECT * FROM a WHERE description LIKE '%fee%'"
+        self.assertEqual(self.agent._bind_company_id(sql, "c1"), (sql, None))
+
+
+class RenderTemplateTests(SimpleTestCase):
+    def test_f_string_substitutes_and_unescapes_braces(self):
+        template = 'Answer about {company_id} as JSON: {{"answer": "..."}}'
+        self.assertEqual(
+            render_template(template, {"company_id": "c1"}),
+            'Answer about c1 as JSON: {"answer": "..."}'
+        )
+
+    def test_f_string_keeps_missing_placeholders(self):
+        self.assertEqual(render_template("{query} for {company_id}", {"query": "q"}), "q for {company_id}")
+
+    def test_jinja2_substitutes_known_names_only(self):
+        template = 'Use {{ company_id }} and {{other}}; reply {"a": 1}'
+        self.assertEqual(
+            render_template(template, {"company_id": "c1"}, "jinja2"),
+            'Use c1 and {{other}}; reply {"a": 1}'
+        )
+
+    def test_jinja2_without_variables(self):
+        self.assertEqual(render_template("{{ name }}", {}, "jinja2"), "{{ name }}")
+
+
+class ReferencedTablesTests(SimpleTestCase):
+    def test_joins_comma_lists_and_subqueries(self):
+        sql = (
+            'SELECT * FROM public.documents d JOIN "Logs" l ON l.document_id = d.id, users u '
+            "WHERE d.id IN (SELECT document_id FROM aws_responses)"
+        )
+        self.assertEqual(referenced_tables(sql), {"documents", "Logs", "aws_responses"})
+        # Tables only reachable through the comma join are still tracked
+        self.assertIn("users", sql_identifiers(sql))
+
+    def test_identifiers_skip_string_literals(self):
+        identifiers = sql_identifiers("SELECT * FROM documents WHERE status = 'logs'")
+        self.assertIn("documents", identifiers)
+        self.assertNotIn("logs", identifiers)
+
+    def test_skips_derived_tables(self):
+        self.assertEqual(referenced_tables("SELECT * FROM (SELECT 1) t"), set())
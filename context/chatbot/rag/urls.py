@@ -3,5 +3,6 @@ from rag import views
 
 urlpatterns = [
     path('documents/query', views.ChatbotView.as_view()),
+    path('documents/query/bank-statements/stream', views.BankStatementStreamView.as_view()),
     path('documents/classify', views.DocumentClassifierView.as_view())
 ]
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Per-document version counters.
+
+The indexer bumps a document's version whenever it (re)indexes its chunks,
+so results derived from a document's content can be cached under
+(document key, version) and looked up without fetching the content first.
+Versions need a store shared with the indexer process, so they are only
+available when REDIS_URL is configured.
+"""
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from settings import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_VERSION_PREFIX = "rag:docver:"
+
+
+@lru_cache(maxsize=1)
+def _redis_client() -> Optional["redis.Redis"]:
+    redis_url = getattr(settings, "REDIS_URL", None)
+    if redis_url and REDIS_AVAILABLE:
+        return redis.Redis.from_url(redis_url)
+    return None
+
+
+def parent_document_key(document_key: str) -> str:
+    """Strip a chunk suffix (<key>_chunk_<n>) to get the indexed document's key."""
+    return document_key.split("_chunk_")[0]
+
+
+def get_document_version(document_key: str) -> Optional[str]:
+    """
+    Current version of a document, or None when it is unknown and callers
+    must not rely on it: versions are unavailable, or the document was
+    written without a bump (e.g. indexed before versions existed or by
+    another writer), so no version can vouch for its content.
+    """
+    client = _redis_client()
+    if client is None:
+        return None
+    try:
+        version = client.get(f"{DOCUMENT_VERSION_PREFIX}{parent_document_key(document_key)}")
+    except Exception as e:
+        logger.warning(f"Document version lookup failed: {str(e)}")
+        return None
+    return version.decode() if version is not None else None
+
+
+def bump_document_version(document_key: str) -> None:
+    """Mark a document's content as changed (called after indexing it)."""
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        client.incr(f"{DOCUMENT_VERSION_PREFIX}{parent_document_key(document_key)}")
+    except Exception as e:
+        logger.warning(f"Document version bump failed: {str(e)}")
@@ -0,0 +1,68 @@
+"""
+Process-wide HTTP clients for OpenAI calls.
+
+Passing the same httpx client to every ChatOpenAI instance (and sharing one
+OpenAI SDK client) keeps TCP/TLS connections alive across requests and agents
+instead of each model opening its own pool. Only sync clients are shared:
+an httpx.AsyncClient is bound to the event loop it first runs on.
+"""
+import atexit
+from functools import lru_cache
+
+import httpx
+import requests
+from openai import OpenAI
+from requests.adapters import HTTPAdapter
+from settings import settings
+from urllib3.util.retry import Retry
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+HTTP_TIMEOUT = httpx.Timeout(60.0)
+OPENAI_MAX_RETRIES = 3
+REQUESTS_POOL_MAXSIZE = 32
+
+
+@lru_cache
+def get_http_client() -> httpx.Client:
+    """Get the shared keep-alive (HTTP/2 when available) sync HTTP client."""
+    client = httpx.Client(http2=HTTP2_AVAILABLE, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    atexit.register(client.close)
+    return client
+
+
+@lru_cache
+def get_openai_client() -> OpenAI:
+    """Get the shared OpenAI SDK client (reuses the keep-alive sync HTTP client)."""
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        max_retries=OPENAI_MAX_RETRIES,
+        timeout=HTTP_TIMEOUT,
+        http_client=get_http_client()
+    )
+
+
+@lru_cache
+def get_requests_session() -> requests.Session:
+    """
+    Get the shared keep-alive requests session for internal API calls.
+
+    Connection failures and 502/503/504 responses are retried with backoff
+    for idempotent methods only (urllib3's default), so uploads are not
+    submitted twice.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=REQUESTS_POOL_MAXSIZE,
+        pool_maxsize=REQUESTS_POOL_MAXSIZE,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504))
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    atexit.register(session.close)
+    return session
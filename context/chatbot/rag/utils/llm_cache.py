@@ -0,0 +1,38 @@
+"""
+LangChain LLM response cache for agents that opt in.
+
+Identical prompts (same messages and model parameters) are answered from the
+cache instead of calling the provider again. Redis is used when REDIS_URL is
+configured so all workers share hits; otherwise an in-memory cache is used.
+
+The cache is passed to individual models with ChatOpenAI(cache=...) rather
+than installed globally, so agents that did not opt in are not affected.
+"""
+import logging
+from functools import lru_cache
+
+from langchain_core.caches import BaseCache, InMemoryCache
+from settings import settings
+
+try:
+    import redis
+    from langchain_community.cache import RedisCache
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL = 3600
+
+
+@lru_cache(maxsize=1)
+def build_llm_cache() -> BaseCache:
+    """Get the process-wide LLM cache, to pass as ChatOpenAI(cache=...)."""
+    redis_url = getattr(settings, "REDIS_URL", None)
+    if redis_url and REDIS_AVAILABLE:
+        logger.info("Using Redis LLM cache")
+        return RedisCache(redis.Redis.from_url(redis_url), ttl=LLM_CACHE_TTL)
+
+    logger.info("Using in-memory LLM cache")
+    return InMemoryCache()
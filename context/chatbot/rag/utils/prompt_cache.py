@@ -0,0 +1,161 @@
+"""
+PromptLayer template caching.
+
+Templates are fetched once per (prompt_id, ENV) and kept for a short TTL, then
+rendered locally with the call's input variables, so the hot path does not
+pay a PromptLayer HTTP round-trip on every query.
+"""
+import logging
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from cachetools import TTLCache
+from promptlayer import PromptLayer
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_TTL = 300
+
+# PromptLayer's template_format when a message does not declare one
+DEFAULT_TEMPLATE_FORMAT = "f-string"
+
+_template_cache: TTLCache = TTLCache(maxsize=32, ttl=TEMPLATE_CACHE_TTL)
+_template_cache_lock = threading.Lock()
+
+
+class SystemTemplate(NamedTuple):
+    """Raw system message of a PromptLayer template and its placeholder syntax."""
+    content: str
+    template_format: str
+
+
+def get_system_template(pl: PromptLayer, prompt_id: str) -> Optional[SystemTemplate]:
+    """
+    Get the raw (unrendered) system message of a PromptLayer template.
+
+    Args:
+        pl: PromptLayer client
+        prompt_id: PromptLayer template name or id
+
+    Returns:
+        SystemTemplate: System message with its placeholders and declared
+        template_format ("f-string" or "jinja2"), or None if it has none
+    """
+    cache_key = (prompt_id, settings.ENV)
+    with _template_cache_lock:
+        if cache_key in _template_cache:
+            return _template_cache[cache_key]
+
+    prompt_template = pl.templates.get(
+        prompt_id,
+        {
+            "provider": "openai",
+            "label": settings.ENV,
+        }
+    )
+
+    system_template = _find_system_template(prompt_template)
+
+    with _template_cache_lock:
+        _template_cache[cache_key] = system_template
+    logger.info(f"Fetched PromptLayer template {prompt_id} ({settings.ENV})")
+    return system_template
+
+
+def _find_system_template(prompt_template: Dict) -> Optional[SystemTemplate]:
+    """
+    Find the system message in a templates.get response.
+
+    The raw message and its template_format live under prompt_template;
+    llm_kwargs is only used when that section is missing.
+    """
+    for message in (prompt_template.get('prompt_template') or {}).get('messages') or []:
+        if message.get('role') != 'system':
+            continue
+        content = message.get('content')
+        if isinstance(content, list):
+            content = "".join(part.get('text', '') for part in content if part.get('type') == 'text')
+        return SystemTemplate(content, message.get('template_format') or DEFAULT_TEMPLATE_FORMAT)
+
+    for message in (prompt_template.get('llm_kwargs') or {}).get('messages') or []:
+        if message['role'] == 'system':
+            return SystemTemplate(message['content'], DEFAULT_TEMPLATE_FORMAT)
+    return None
+
+
+class _KeepMissing(dict):
+    """format_map mapping that leaves placeholders without a value as they are."""
+
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+def render_template(template: str, input_variables: Dict, template_format: str = DEFAULT_TEMPLATE_FORMAT) -> str:
+    """
+    Substitute input variables into a template.
+
+    f-string templates are rendered with str.format_map, which also unescapes
+    {{ and }} to literal braces; placeholders without a value are kept.
+    jinja2 templates only have their {{ name }} placeholders replaced.
+    """
+    if template_format == "jinja2":
+        if not input_variables:
+            return template
+        names = "|".join(re.escape(name) for name in input_variables)
+        pattern = re.compile(r"\{\{\s*(" + names + r")\s*\}\}")
+        return pattern.sub(lambda match: str(input_variables[match.group(1)]), template)
+
+    return template.format_map(_KeepMissing(input_variables))
+
+
+def get_system_message(pl: PromptLayer, prompt_id: str, input_variables: Dict) -> Optional[str]:
+    """Get a PromptLayer system message rendered with input_variables (template cached)."""
+    template = get_system_template(pl, prompt_id)
+    if template is None:
+        return None
+    return render_template(template.content, input_variables, template.template_format)
+
+
+def build_cacheable_messages(
+    pl: PromptLayer,
+    prompt_id: str,
+    static_variables: Dict,
+    dynamic_variables: Dict,
+    fallback_prompt: str
+) -> List[Dict]:
+    """
+    Build chat messages whose system prefix is identical across requests.
+
+    OpenAI's automatic prompt caching only applies to a shared prefix, so the
+    system message is rendered with the static variables (schema, limits)
+    only; per-request values are referenced by name there and passed in a
+    trailing user message instead.
+
+    Args:
+        pl: PromptLayer client
+        prompt_id: PromptLayer template name or id
+        static_variables: Values that are the same for every request
+        dynamic_variables: Per-request values (query, ids, results)
+        fallback_prompt: System prompt to use if the template has none
+
+    Returns:
+        List[Dict]: Messages for ChatOpenAI.invoke
+    """
+    template = get_system_template(pl, prompt_id)
+    if template is None:
+        return [{"role": "system", "content": fallback_prompt}]
+
+    references = {name: f"<{name}> (given in the user message)" for name in dynamic_variables}
+    system_content = render_template(
+        template.content, {**static_variables, **references}, template.template_format
+    )
+    user_content = "\n\n".join(
+        f"<{name}>\n{value}\n</{name}>" for name, value in dynamic_variables.items()
+    )
+
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ]
@@ -0,0 +1,110 @@
+"""
+Proactive client-side throttling for OpenAI calls.
+
+Requests and estimated tokens are drawn from process-wide token buckets
+sized to OPENAI_RPM / OPENAI_TPM before each call, so bursts wait briefly
+up front instead of hitting 429s and stalling in SDK retry backoff. Either
+limit is disabled when its setting is missing or zero.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from settings import settings
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_PERIOD = 60
+# Rough cost of one image part (high detail, ~1024px page) and of the reply
+IMAGE_TOKEN_ESTIMATE = 765
+COMPLETION_TOKEN_ESTIMATE = 500
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Holds up to max_rate tokens and refills at max_rate per time_period
+    seconds. Requests larger than the bucket are clamped to its size so
+    they wait for a full bucket rather than forever.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = RATE_LIMIT_PERIOD):
+        self.max_rate = float(max_rate)
+        self.refill_per_second = self.max_rate / time_period
+        self._tokens = self.max_rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """Take amount if available and return 0, else return seconds to wait."""
+        amount = min(amount, self.max_rate)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_rate, self._tokens + (now - self._updated) * self.refill_per_second)
+            self._updated = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.refill_per_second
+
+    def acquire(self, amount: float = 1) -> None:
+        while True:
+            wait = self._reserve(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+def _bucket(setting_name: str) -> Optional[TokenBucket]:
+    max_rate = getattr(settings, setting_name, None)
+    return TokenBucket(max_rate) if max_rate else None
+
+
+_request_bucket = _bucket("OPENAI_RPM")
+_token_bucket = _bucket("OPENAI_TPM")
+_encoding = None
+
+
+def _encode_length(text: str) -> int:
+    global _encoding
+    if not TIKTOKEN_AVAILABLE:
+        return len(text) // 4
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL_V1)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text))
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Estimate the TPM cost of a chat request (prompt text, images and reply)."""
+    tokens = COMPLETION_TOKEN_ESTIMATE
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        if isinstance(content, str):
+            tokens += _encode_length(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                tokens += IMAGE_TOKEN_ESTIMATE
+            else:
+                tokens += _encode_length(part.get("text", ""))
+    return tokens
+
+
+def throttle(messages: List[Dict]) -> None:
+    """Block until the request fits within the configured RPM/TPM limits."""
+    if _request_bucket:
+        _request_bucket.acquire()
+    if _token_bucket:
+        _token_bucket.acquire(estimate_tokens(messages))
+
@@ -0,0 +1,50 @@
+"""
+Request context for chatbot agents.
+
+Entry points set the current session/company/document in a ContextVar, so
+helpers deep in the call stack (and worker threads started with
+asyncio.to_thread, which copies the context) can tag logs without the IDs
+being threaded through every call. RequestContextFilter exposes them to log
+formatters as %(session_id)s, %(company_id)s and %(document_key)s.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    session_id: Optional[str] = None
+    company_id: Optional[str] = None
+    document_key: Optional[str] = None
+
+
+_EMPTY_CONTEXT = RequestContext()
+_request_context: ContextVar[RequestContext] = ContextVar("rag_request_context", default=_EMPTY_CONTEXT)
+
+
+def get_request_context() -> RequestContext:
+    return _request_context.get()
+
+
+@contextmanager
+def request_context(session_id: str = None, company_id: str = None, document_key: str = None):
+    """Set the request context for the duration of the block."""
+    token = _request_context.set(RequestContext(session_id, company_id, document_key))
+    try:
+        yield
+    finally:
+        _request_context.reset(token)
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the current request context's IDs to log records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        record.session_id = context.session_id or "-"
+        record.company_id = context.company_id or "-"
+        record.document_key = context.document_key or "-"
+        return True
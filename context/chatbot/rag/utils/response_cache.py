@@ -0,0 +1,99 @@
+"""
+Exact-match response cache.
+
+Responses are keyed by the caller's scope (company, page, ...) plus the
+normalized query text, so only the same question - with the same ids,
+numbers and dates - is ever answered from the cache.
+
+Each entry also records a change version for every table the generated SQL
+mentions (see referenced_tables and sql_identifiers). The caller re-reads
+those versions on a hit and only serves the entry if none of the tables
+changed since it was stored. The cache is per process.
+"""
+import copy
+import re
+import threading
+from typing import Dict, Hashable, NamedTuple, Optional, Set
+
+from cachetools import TTLCache
+
+RESPONSE_CACHE_TTL = 600
+RESPONSE_CACHE_MAXSIZE = 1024
+
+# Relation references: "schema"."table", schema.table, "table", table, with an optional alias
+_TABLE_REF = r'(?:"[^"]+"|\w+)(?:\s*\.\s*(?:"[^"]+"|\w+))?(?:\s+(?:as\s+)?\w+)?'
+# FROM / JOIN followed by one reference or a comma-separated list of them
+_FROM_LIST_RE = re.compile(rf'\b(?:from|join)\s+({_TABLE_REF}(?:\s*,\s*{_TABLE_REF})*)', re.IGNORECASE)
+_TABLE_NAME_RE = re.compile(r'(?:^|,)\s*((?:"[^"]+"|\w+)(?:\s*\.\s*(?:"[^"]+"|\w+))?)')
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_IDENTIFIER_RE = re.compile(r'"([^"]+)"|\b([A-Za-z_]\w*)')
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+def referenced_tables(sql_query: str) -> Set[str]:
+    """
+    Names of the relations an SQL query reads after FROM or JOIN.
+
+    Schema prefixes and quotes are dropped. Subqueries are skipped, but
+    anything else that follows FROM (a CTE name, a set-returning function,
+    EXTRACT(... FROM column)) is returned too; callers should not cache
+    queries whose names don't all resolve to tables.
+    """
+    tables = set()
+    for from_list in _FROM_LIST_RE.findall(sql_query):
+        for reference in _TABLE_NAME_RE.findall(from_list):
+            name = reference.rsplit(".", 1)[-1].strip()
+            tables.add(name[1:-1] if name.startswith('"') else name.lower())
+    return tables
+
+
+def sql_identifiers(sql_query: str) -> Set[str]:
+    """
+    Every identifier in an SQL query (keywords included, string literals not).
+
+    A superset of the tables the query can read, wherever they appear
+    (comma joins after ON, subqueries, CTE bodies); callers intersect it
+    with the tables that actually exist.
+    """
+    identifiers = set()
+    for quoted, unquoted in _IDENTIFIER_RE.findall(_STRING_LITERAL_RE.sub("''", sql_query)):
+        identifiers.add(quoted or unquoted.lower())
+    return identifiers
+
+
+class CachedResponse(NamedTuple):
+    # table name -> change version when the response was computed
+    table_versions: Dict[str, tuple]
+    response: Dict
+
+
+class ResponseCache:
+    """Per-process TTL cache of responses keyed by scope and normalized query."""
+
+    def __init__(self, ttl: int = RESPONSE_CACHE_TTL, maxsize: int = RESPONSE_CACHE_MAXSIZE):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(scope: Hashable, query: str) -> tuple:
+        return (scope, normalize_query(query))
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        """Return a copy of the entry for this key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return CachedResponse(dict(entry.table_versions), copy.deepcopy(entry.response))
+
+    def set(self, key: tuple, table_versions: Dict[str, tuple], response: Dict) -> None:
+        entry = CachedResponse(dict(table_versions), copy.deepcopy(response))
+        with self._lock:
+            self._entries[key] = entry
+
+    def discard(self, key: tuple) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
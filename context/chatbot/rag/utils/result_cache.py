@@ -0,0 +1,86 @@
+"""
+Content-addressed cache for LLM results.
+
+Results are keyed by a hash of the input content (plus whatever else the
+result depends on) so identical inputs are answered without another model
+call. Redis is used when REDIS_URL is configured so all workers share hits;
+otherwise a per-process TTL cache is used.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Union
+
+from cachetools import TTLCache
+from settings import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_TTL = 24 * 3600
+LOCAL_RESULT_CACHE_MAXSIZE = 1024
+
+
+def content_hash(content: Union[bytes, bytearray, memoryview, str], *parts: Iterable[str]) -> str:
+    """
+    Hash content together with the extra parts the result depends on.
+
+    blake3 is used when installed (much faster on large payloads), blake2b
+    otherwise.
+    """
+    hasher = blake3.blake3() if BLAKE3_AVAILABLE else hashlib.blake2b(digest_size=32)
+    hasher.update(content.encode() if isinstance(content, str) else content)
+    for part in parts:
+        hasher.update(b"\0" + "\x1f".join(part).encode())
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """JSON result cache keyed by content hash, backed by Redis or a local TTL cache."""
+
+    def __init__(self, prefix: str, ttl: int = RESULT_CACHE_TTL, maxsize: int = LOCAL_RESULT_CACHE_MAXSIZE):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.client = None
+        redis_url = getattr(settings, "REDIS_URL", None)
+        if redis_url and REDIS_AVAILABLE:
+            self.client = redis.Redis.from_url(redis_url)
+        else:
+            self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+            self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        if self.client is None:
+            with self._lock:
+                value = self._local.get(key)
+            # Copy so callers cannot mutate the cached entry
+            return copy.deepcopy(value)
+        try:
+            payload = self.client.get(f"{self.prefix}{key}")
+        except Exception as e:
+            logger.warning(f"Result cache read failed: {str(e)}")
+            return None
+        return json.loads(payload) if payload is not None else None
+
+    def set(self, key: str, value: Dict) -> None:
+        if self.client is None:
+            with self._lock:
+                self._local[key] = value
+            return
+        try:
+            self.client.set(f"{self.prefix}{key}", json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Result cache write failed: {str(e)}")
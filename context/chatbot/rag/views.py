@@ -1,5 +1,7 @@
+import json
 import logging
 import uuid
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -8,6 +10,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rag.serializers import ChatbotRequestSerializer, SuccessResponseSerializer, ErrorResponseSerializer
 from rag.services.conversation_service import ConversationService
 from rag.utils.utils import parse_request_body
+from rag.renderers import RENDERER_CLASSES
 from rag.agents.orchestrator_agent import OrchestratorAgent
 from rag.agents.rag_agent import RagAgent
 from rag.agents.web_search_agent import WebSearchAgent
@@ -23,6 +26,7 @@ from rag.graph.workflow import WorkflowManager
 class ChatbotView(APIView):
     authentication_classes = []
     permission_classes = []
+    renderer_classes = RENDERER_CLASSES
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -199,10 +203,55 @@ class ChatbotView(APIView):
             self.logger.error(f"Error in agentic workflow: {str(e)}")
             return {"message": f"Failed to process query: {str(e)}", "data": None}
 
+class BankStatementStreamView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bank_statement_details_agent = BankStatementDetailsAgent()
+        self.logger = logging.getLogger(__name__)
+
+    @swagger_auto_schema(
+        request_body=ChatbotRequestSerializer,
+        responses={
+            '200': 'text/event-stream of response tokens',
+            '400': ErrorResponseSerializer
+        }
+    )
+    def post(self, request):
+        req = parse_request_body(request)
+        if isinstance(req, Response):
+            return req
+
+        validation = ChatbotRequestSerializer(data=req)
+        if not validation.is_valid():
+            error_data = {"message": "Invalid request body", "errors": validation.errors}
+            return Response(ErrorResponseSerializer(error_data).data, status=status.HTTP_400_BAD_REQUEST)
+
+        company_id = validation.validated_data.get('company_id')
+        session_id = validation.validated_data.get('thread_id') or validation.validated_data.get('session_id')
+
+        def event_stream():
+            for token in self.bank_statement_details_agent.stream_process_query(
+                query=validation.validated_data['query'],
+                company_id=str(company_id) if company_id else None,
+                document_key=validation.validated_data.get('document_key'),
+                session_id=session_id
+            ):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 class DocumentClassifierView(APIView):
     authentication_classes = []
     permission_classes = []
     parser_classes = (MultiPartParser, FormParser)
+    renderer_classes = RENDERER_CLASSES
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -236,6 +285,9 @@ class DocumentClassifierView(APIView):
                 session_id = str(uuid.uuid4())
                 self.logger.info(f"Generated new session_id: {session_id}")
             
+            # Needed to submit the document on confirmation; never stored in session data
+            self.document_classifier_agent.store_auth_token(session_id, auth_token)
+            
             # Get file from request
             if 'file' not in request.FILES:
                 error_data = {"message": "No file provided"}
@@ -265,9 +317,8 @@ class DocumentClassifierView(APIView):
                     "awaiting_confirmation": True,
                     "company_id": company_id,
                     "document_key": document_key,
-                    "file": file_content,
-                    "filename": filename,
-                    "auth_token": auth_token
+                    "file_sha": self.document_classifier_agent.store_upload(file_content),
+                    "filename": filename
                 })                
                 
                 # Construct a response similar to what process_query would return
@@ -299,7 +350,7 @@ class DocumentClassifierView(APIView):
                     "awaiting_confirmation": True,
                     "company_id": company_id,
                     "document_key": document_key,
-                    "file": file_content,
+                    "file_sha": self.document_classifier_agent.store_upload(file_content),
                     "filename": filename,
                     "error": str(classification_error)
                 })
@@ -0,0 +1,55 @@
+-- Rewrite the semantic-search RPC so pgvector's HNSW index is used, and drop
+-- the thread-filtered match_documents RPC (the backend only calls
+-- match_documents_by_user).
+--
+-- The planner only uses an HNSW index for `ORDER BY embedding <=> $q LIMIT k`
+-- (ascending distance operator). Ordering by `1 - distance` or filtering on
+-- the similarity in the same query level forces a Seq Scan + top-N sort, so
+-- the nearest-neighbour search runs in an inner query and the threshold is
+-- applied to its k rows afterwards.
+--
+-- Embeddings are compared with cosine distance (<=>), so there is no L2 sqrt
+-- to avoid here.
+
+create extension if not exists vector;
+
+create index if not exists documents_embedding_hnsw_idx
+    on documents using hnsw (embedding vector_cosine_ops);
+
+create index if not exists documents_user_id_idx
+    on documents (user_id);
+
+-- Return types change (similarity is computed in the outer query), so drop first
+drop function if exists match_documents_by_user(vector, text, float, int);
+drop function if exists match_documents(vector, text, text, float, int);
+
+create or replace function match_documents_by_user(
+    query_embedding vector(1536),
+    filter_user_id text,
+    match_threshold float default 0.1,
+    match_count int default 10
+)
+returns table (
+    id documents.id%type,
+    key documents.key%type,
+    content documents.content%type,
+    metadata documents.metadata%type,
+    similarity float
+)
+language sql stable
+-- Candidates are post-filtered by user_id, so search a wider beam than k
+set hnsw.ef_search = 100
+as $$
+    select nearest.id, nearest.key, nearest.content, nearest.metadata,
+           1 - nearest.distance as similarity
+    from (
+        select d.id, d.key, d.content, d.metadata,
+               d.embedding <=> query_embedding as distance
+        from documents d
+        where d.user_id = filter_user_id
+        order by d.embedding <=> query_embedding
+        limit match_count
+    ) nearest
+    where 1 - nearest.distance > match_threshold
+    order by nearest.distance;
+$$;
@@ -0,0 +1,3 @@
+-- Chunk keys are "<document_key>_chunk_<n>"; make them unique so batched
+-- ingestion can upsert with ON CONFLICT (key).
+create unique index if not exists documents_key_idx on documents (key);
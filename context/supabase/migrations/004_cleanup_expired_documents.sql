@@ -0,0 +1,23 @@
+-- Delete the vector chunks of all expired session-only uploads in one
+-- statement and hand back their storage paths for bulk file removal.
+-- documents_document is the Django Document table, which lives in the same
+-- Supabase Postgres database; its rows are deleted by the caller afterwards.
+
+create or replace function cleanup_expired_documents(cutoff timestamptz)
+returns setof text
+language sql
+as $$
+    with expired as (
+        select document_key, user_id::text as user_id, storage_path
+        from documents_document
+        where is_persistent = false
+          and created_at < cutoff
+    ),
+    deleted_chunks as (
+        delete from documents d
+        using expired e
+        where d.parent_key = e.document_key
+          and d.user_id = e.user_id
+    )
+    select storage_path from expired where storage_path <> '';
+$$;
@@ -19,18 +19,26 @@ export default function DocumentsPage() {
   const [documents, setDocuments] = useState<Document[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [deletingId, setDeletingId] = useState<string | null>(null);
+  const [nextPage, setNextPage] = useState<number | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
-    fetchDocuments();
+    fetchDocuments(1);
   }, []);
 
-  const fetchDocuments = async () => {
+  // The list is paginated server-side; later pages are appended on demand
+  const fetchDocuments = async (page: number) => {
     try {
-      const response = await apiClient.get<{ success: boolean; documents: Document[] }>(
-        '/api/documents/'
-      );
+      const response = await apiClient.get<{
+        success: boolean;
+        next: string | null;
+        documents: Document[];
+      }>(`/api/documents/?page=${page}`);
       if (response.success) {
-        setDocuments(response.documents);
+        setDocuments((current) =>
+          page === 1 ? response.documents : [...current, ...response.documents]
+        );
+        setNextPage(response.next ? page + 1 : null);
       }
     } catch (error) {
       toast.error('Failed to load documents');
@@ -39,11 +47,18 @@ export default function DocumentsPage() {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (nextPage === null) return;
+    setIsLoadingMore(true);
+    await fetchDocuments(nextPage);
+    setIsLoadingMore(false);
+  };
+
   const handleDelete = async (id: string) => {
     setDeletingId(id);
     try {
       await apiClient.delete(`/api/documents/${id}/delete/`);
-      setDocuments(documents.filter((d) => d.id !== id));
+      setDocuments((current) => current.filter((d) => d.id !== id));
       toast.success('Document deleted');
     } catch {
       toast.error('Failed to delete document');
@@ -166,6 +181,18 @@ export default function DocumentsPage() {
               })}
             </tbody>
           </table>
+          {nextPage !== null && (
+            <div className="flex justify-center border-t border-border p-3">
+              <button
+                onClick={handleLoadMore}
+                disabled={isLoadingMore}
+                className="inline-flex items-center gap-2 px-4 py-2 rounded-lg text-sm font-medium bg-accent/10 text-accent hover:bg-accent/20 transition-colors disabled:opacity-50"
+              >
+                {isLoadingMore && <Loader2 className="h-4 w-4 animate-spin" />}
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>